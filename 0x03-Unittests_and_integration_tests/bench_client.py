@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Benchmark GithubOrgClient.public_repos offline.
+Serves synthetic orgs (or a recorded cassette) from a local replay
+server and times fetching every org's public repos, so pooling and
+caching changes can be compared without the live API.
+Example
+-------
+$ ./bench_client.py --orgs 500 --workers 16 --latency 0.02
+$ ./bench_client.py --cassette github.json --rounds 3 --keep-cache
+"""
+import argparse
+import time
+
+from client import GithubOrgClient
+from replay import Cassette, replay
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--orgs", type=int, default=200,
+                        help="synthetic orgs to serve (default: 200)")
+    parser.add_argument("--repos-per-org", type=int, default=None,
+                        help="repos per synthetic org (default: fixture)")
+    parser.add_argument("--cassette",
+                        help="replay this recorded cassette instead")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="orgs fetched concurrently (default: 8)")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="times to fetch every org (default: 3)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to each response")
+    parser.add_argument("--bandwidth", type=float, default=None,
+                        help="bytes per second per response")
+    parser.add_argument("--license", default=None,
+                        help="filter repos by license key")
+    parser.add_argument("--keep-cache", action="store_true",
+                        help="keep the shared cache between rounds")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Run the benchmark and print one line per round."""
+    args = parse_args()
+    if args.cassette:
+        cassette = Cassette.load(args.cassette)
+    else:
+        cassette = Cassette.from_fixtures(args.orgs,
+                                          repos_per_org=args.repos_per_org)
+    orgs = cassette.orgs()
+
+    with replay(cassette, args.latency, args.bandwidth) as server:
+        for number in range(1, args.rounds + 1):
+            if not args.keep_cache and GithubOrgClient.shared_cache:
+                GithubOrgClient.shared_cache.clear()
+            served = server.requests
+            start = time.perf_counter()
+            repos = errors = 0
+            for _, names, error in GithubOrgClient.fetch_many(
+                orgs, license=args.license, max_workers=args.workers
+            ):
+                if error is None:
+                    repos += len(names)
+                else:
+                    errors += 1
+            elapsed = time.perf_counter() - start
+            requests = server.requests - served
+            print("round {}: {} orgs, {} repos, {} errors in {:.3f}s"
+                  " ({:.1f} orgs/s, {:.1f} requests/s)".format(
+                      number, len(orgs), repos, errors, elapsed,
+                      len(orgs) / elapsed, requests / elapsed))
+
+
+if __name__ == "__main__":
+    main()
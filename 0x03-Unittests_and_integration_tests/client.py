@@ -1,58 +1,192 @@
 #!/usr/bin/env python3
 """A github org client
 """
+import copy
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import (
+    Any,
+    Callable,
     List,
     Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    Tuple,
 )
 
 from utils import (
     get_json,
-    access_nested_map,
+    iter_json_pages,
+    compile_path,
     memoize,
+    LRUCache,
 )
 
+_license_key = compile_path(("license", "key"), default=None)
+_MISSING = object()
+
+
+def _is_org(payload: Any) -> bool:
+    """True for an org payload, False for an API error body"""
+    return isinstance(payload, dict) and "repos_url" in payload
+
 
 class GithubOrgClient:
     """A Githib org client
     """
     ORG_URL = "https://api.github.com/orgs/{org}"
+    PER_PAGE = 100
+    # Fields kept from each repo when streaming names (iter_public_repos)
+    REPO_FIELDS = (("name",), ("license", "key"))
+    # Shared by every instance, keyed by URL. Assign an SQLiteCache to
+    # share payloads between processes, or None to disable. Each client
+    # gets its own copy of a payload, so mutating it affects no other.
+    shared_cache = LRUCache(maxsize=256, ttl=300)
 
     def __init__(self, org_name: str) -> None:
         """Init method of GithubOrgClient"""
         self._org_name = org_name
 
+    @property
+    def _org_url(self) -> str:
+        """Org URL"""
+        return self.ORG_URL.format(org=self._org_name)
+
+    def _shared(self, url: str, fetch: Callable[[], Any],
+                valid: Callable[[Any], bool] = None) -> Any:
+        """Return a copy of the shared cached value for url.
+        On a miss the value is fetched, and cached if it passes valid, so
+        an error body (a 404, or a spent rate limit) is refetched by the
+        next client.
+        """
+        cache = self.shared_cache
+        if cache is None:
+            return fetch()
+        value = cache.get(url, _MISSING)
+        if value is _MISSING:
+            value = fetch()
+            if valid is None or valid(value):
+                cache.set(url, copy.deepcopy(value))
+            return value
+        return copy.deepcopy(value)
+
     @memoize
     def org(self) -> Dict:
         """Memoize org"""
-        return get_json(self.ORG_URL.format(org=self._org_name))
+        url = self._org_url
+        return self._shared(url, lambda: get_json(url), _is_org)
 
     @property
     def _public_repos_url(self) -> str:
         """Public repos URL"""
         return self.org["repos_url"]
 
+    def _iter_repos_at(
+        self, repos_url: str, paths: Sequence[Sequence] = None,
+    ) -> Iterator[Dict]:
+        """Stream repos from repos_url, one page at a time"""
+        params = {"per_page": self.PER_PAGE}
+        if paths is None:
+            pages = iter_json_pages(repos_url, params)
+        else:
+            pages = iter_json_pages(repos_url, params, paths=paths)
+        for page in pages:
+            if not isinstance(page, list):
+                # An API error body, e.g. {"message": "Not Found"}
+                raise ValueError(
+                    "expected a list of repos from {}, got {!r}".format(
+                        repos_url, page
+                    )
+                )
+            yield from page
+
+    def iter_repos(self) -> Iterator[Dict]:
+        """Stream repos, requesting the next page only when needed"""
+        yield from self._iter_repos_at(self._public_repos_url)
+
     @memoize
-    def repos_payload(self) -> Dict:
-        """Memoize repos payload"""
-        return get_json(self._public_repos_url)
+    def repos_payload(self) -> List[Dict]:
+        """Memoize repos payload (every page)"""
+        url = self._public_repos_url
+        return self._shared(url, lambda: list(self._iter_repos_at(url)))
+
+    def refresh(self) -> None:
+        """Drop the memoized org and repos so they are fetched again.
+        Never fetches: the shared repos entry is found through an org
+        payload this client or the shared cache already holds.
+        """
+        cache = self.shared_cache
+        if cache is not None:
+            org = self.__dict__.get(GithubOrgClient.org.attr_name)
+            if org is None:
+                org = cache.get(self._org_url)
+            if _is_org(org):
+                cache.delete(org["repos_url"])
+            cache.delete(self._org_url)
+        GithubOrgClient.org.invalidate(self)
+        GithubOrgClient.repos_payload.invalidate(self)
+
+    @property
+    def license_index(self) -> Dict[str, List[str]]:
+        """Repo names by license key, rebuilt when repos_payload changes"""
+        json_payload = self.repos_payload
+        cached = getattr(self, "_license_index", None)
+        if cached is None or cached[0] is not json_payload:
+            index = {}
+            for repo in json_payload:
+                key = _license_key(repo)
+                if key is not None:
+                    index.setdefault(key, []).append(repo["name"])
+            cached = (json_payload, index)
+            self._license_index = cached
+        return cached[1]
 
     def public_repos(self, license: str = None) -> List[str]:
         """Public repos"""
-        json_payload = self.repos_payload
-        public_repos = [
-            repo["name"] for repo in json_payload
-            if license is None or self.has_license(repo, license)
-        ]
+        if license is not None:
+            return list(self.license_index.get(license, ()))
+
+        return [repo["name"] for repo in self.repos_payload]
 
-        return public_repos
+    def iter_public_repos(self, license: str = None) -> Iterator[str]:
+        """Stream public repo names without holding every page in memory.
+        Each page is parsed as it arrives and only REPO_FIELDS are kept.
+        """
+        repos = self._iter_repos_at(self._public_repos_url, self.REPO_FIELDS)
+        for repo in repos:
+            if license is None or self.has_license(repo, license):
+                yield repo["name"]
+
+    @classmethod
+    def fetch_many(
+        cls, org_names: Iterable[str], license: str = None,
+        max_workers: int = 8,
+    ) -> Iterator[Tuple[str, Optional[List[str]], Optional[Exception]]]:
+        """Fetch public repos of many orgs concurrently.
+        Yields ``(org_name, repos, error)`` as each org finishes. At most
+        max_workers orgs are fetched at once; their requests share the
+        pooled session and wait on any host rate limit that is hit.
+        """
+        def fetch(org_name: str) -> List[str]:
+            return cls(org_name).public_repos(license=license)
+
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {
+                pool.submit(fetch, org_name): org_name
+                for org_name in org_names
+            }
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as exc:
+                    yield futures[future], None, exc
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
 
     @staticmethod
     def has_license(repo: Dict[str, Dict], license_key: str) -> bool:
         """Static: has_license"""
         assert license_key is not None, "license_key cannot be None"
-        try:
-            has_license = access_nested_map(repo, ("license", "key")) == license_key
-        except KeyError:
-            return False
-        return has_license
+        return _license_key(repo) == license_key
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""Record and replay GitHub API responses for offline runs.
+A Cassette holds responses keyed by request path. It can be recorded
+from the live API with ``record`` or synthesized from ``TEST_PAYLOAD``
+with ``Cassette.from_fixtures``; ``replay`` then serves it from a local
+stub server with optional latency and bandwidth limits, and routes the
+client's ``https://api.github.com/`` requests there.
+Example
+-------
+>>> cassette = Cassette.from_fixtures(orgs=50)
+>>> with replay(cassette, latency=0.02):
+...     GithubOrgClient("org0").public_repos()
+"""
+import copy
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Mapping, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from fixtures import TEST_PAYLOAD
+from utils import POOL_SIZE, mount_adapter, unmount_adapter
+
+__all__ = [
+    "API_URL",
+    "Cassette",
+    "ReplayServer",
+    "ReplayAdapter",
+    "RecordingAdapter",
+    "record",
+    "replay",
+]
+
+API_URL = "https://api.github.com/"
+# Response headers the client reads; everything else is dropped
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link")
+WRITE_CHUNK = 16 * 1024
+
+
+class Cassette:
+    """Recorded responses keyed by request path and query."""
+
+    def __init__(self, entries: Optional[Dict] = None) -> None:
+        """Init from {key: {"status", "headers", "body"}} entries."""
+        self.entries = dict(entries or {})
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url: str) -> str:
+        """Return the lookup key for url: its path and query."""
+        parts = urlsplit(url)
+        return parts.path + ("?" + parts.query if parts.query else "")
+
+    def add(self, url: str, status: int, body: bytes,
+            headers: Optional[Mapping] = None) -> None:
+        """Store the response to url."""
+        headers = headers or {}
+        entry = {
+            "status": status,
+            "headers": {
+                name: headers[name] for name in KEPT_HEADERS
+                if name in headers
+            },
+            "body": body.decode("utf-8"),
+        }
+        with self._lock:
+            self.entries[self.key(url)] = entry
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Return the entry for url, or None."""
+        return self.entries.get(self.key(url))
+
+    def orgs(self) -> List[str]:
+        """Return the names of the orgs in the cassette."""
+        return sorted(
+            key.split("/")[2] for key in self.entries
+            if key.startswith("/orgs/") and key.count("/") == 2
+        )
+
+    def __len__(self) -> int:
+        """Number of recorded responses."""
+        return len(self.entries)
+
+    def save(self, path: str) -> None:
+        """Write the cassette to path as JSON."""
+        with open(path, "w") as file:
+            json.dump(self.entries, file, indent=1, sort_keys=True)
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        """Read a cassette written by save."""
+        with open(path) as file:
+            return cls(json.load(file))
+
+    @classmethod
+    def from_fixtures(cls, orgs: int = 100, per_page: int = 100,
+                      repos_per_org: Optional[int] = None) -> "Cassette":
+        """Synthesize orgs ``org0`` .. ``org<n-1>`` from TEST_PAYLOAD.
+        Each org serves a copy of a fixture org and its repos, paginated
+        like the API with ``Link`` headers; per_page must match the
+        client's PER_PAGE. repos_per_org pads (or trims) each listing by
+        cycling the fixture repos under new names.
+        """
+        cassette = cls()
+        for index in range(orgs):
+            name = "org{}".format(index)
+            template_org, template_repos = TEST_PAYLOAD[
+                index % len(TEST_PAYLOAD)
+            ][:2]
+            repos_url = "{}orgs/{}/repos".format(API_URL, name)
+            org = dict(template_org, login=name, repos_url=repos_url)
+            cassette.add(API_URL + "orgs/" + name, 200, _dump(org))
+
+            count = repos_per_org or len(template_repos)
+            repos = []
+            for number in range(count):
+                repo = copy.deepcopy(
+                    template_repos[number % len(template_repos)]
+                )
+                if number >= len(template_repos):
+                    repo["name"] = "{}-{}".format(repo["name"], number)
+                repos.append(repo)
+
+            pages = [
+                repos[start:start + per_page]
+                for start in range(0, len(repos), per_page)
+            ] or [[]]
+            for page, items in enumerate(pages, 1):
+                url = "{}?per_page={}".format(repos_url, per_page)
+                headers = {"Content-Type": "application/json"}
+                if page < len(pages):
+                    headers["Link"] = '<{}&page={}>; rel="next"'.format(
+                        url, page + 1
+                    )
+                if page > 1:
+                    url = "{}&page={}".format(url, page)
+                cassette.add(url, 200, _dump(items), headers)
+        return cassette
+
+
+def _dump(payload) -> bytes:
+    """Encode payload as the API would."""
+    return json.dumps(payload).encode("utf-8")
+
+
+class ReplayServer:
+    """Serve a cassette over HTTP from a background thread.
+    latency is added before each response, in seconds; bandwidth caps
+    how fast each body is written, in bytes per second (None: no cap).
+    Unknown paths get a 404 like the API's.
+    """
+
+    def __init__(self, cassette: Cassette, latency: float = 0.0,
+                 bandwidth: Optional[float] = None,
+                 host: str = "127.0.0.1", port: int = 0) -> None:
+        """Init and start serving."""
+        self.cassette = cassette
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server, without a trailing slash."""
+        return "http://{}:{}".format(*self._server.server_address)
+
+    def close(self) -> None:
+        """Stop serving."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "ReplayServer":
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Context manager exit."""
+        self.close()
+
+    def _handler(self) -> type:
+        """Build the request handler class bound to this server."""
+        replay_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Answer GETs from the cassette."""
+            protocol_version = "HTTP/1.1"  # Keep-alive, like the API
+            # Headers and body go out in separate writes; without this
+            # Nagle holds the body back for the client's delayed ACK
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                """Send the recorded response for the path."""
+                with replay_server._lock:
+                    replay_server.requests += 1
+                entry = replay_server.cassette.get(self.path) or {
+                    "status": 404,
+                    "headers": {"Content-Type": "application/json"},
+                    "body": '{"message": "Not Found"}',
+                }
+                body = entry["body"].encode("utf-8")
+                if replay_server.latency:
+                    time.sleep(replay_server.latency)
+                self.send_response(entry["status"])
+                for name, value in entry["headers"].items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self._write(body)
+
+            def _write(self, body: bytes) -> None:
+                """Write body, throttled to the server's bandwidth."""
+                bandwidth = replay_server.bandwidth
+                if not bandwidth:
+                    self.wfile.write(body)
+                    return
+                for start in range(0, len(body), WRITE_CHUNK):
+                    chunk = body[start:start + WRITE_CHUNK]
+                    self.wfile.write(chunk)
+                    time.sleep(len(chunk) / bandwidth)
+
+            def log_message(self, format, *args):
+                """Keep replays quiet"""
+
+        return Handler
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Send requests to a ReplayServer instead of their real host.
+    Only the scheme and host are rewritten, so paths, queries and the
+    ``Link`` URLs in recorded responses all resolve as they would live.
+    """
+
+    def __init__(self, server_url: str, **kwargs) -> None:
+        """Init with the base URL of the server to send requests to."""
+        kwargs.setdefault("pool_maxsize", POOL_SIZE)
+        super().__init__(**kwargs)
+        parts = urlsplit(server_url)
+        self._scheme, self._netloc = parts.scheme, parts.netloc
+
+    def send(self, request: requests.PreparedRequest,
+             **kwargs) -> requests.Response:
+        """Send request to the server, reporting its original URL."""
+        url = request.url
+        parts = urlsplit(url)
+        request.url = urlunsplit(
+            (self._scheme, self._netloc) + tuple(parts[2:])
+        )
+        try:
+            response = super().send(request, **kwargs)
+        finally:
+            request.url = url
+        response.url = url
+        return response
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Pass requests through and store every response in a cassette."""
+
+    def __init__(self, cassette: Cassette, **kwargs) -> None:
+        """Init with the cassette to record into."""
+        kwargs.setdefault("pool_maxsize", POOL_SIZE)
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request: requests.PreparedRequest,
+             **kwargs) -> requests.Response:
+        """Send request and record its response."""
+        response = super().send(request, **kwargs)
+        # Reading content here still lets a streaming caller iterate it
+        self.cassette.add(request.url, response.status_code,
+                          response.content, response.headers)
+        return response
+
+
+@contextmanager
+def record(cassette: Cassette, prefix: str = API_URL) -> Iterator[Cassette]:
+    """Record every response for URLs under prefix into cassette."""
+    mount_adapter(prefix, RecordingAdapter(cassette))
+    try:
+        yield cassette
+    finally:
+        unmount_adapter(prefix)
+
+
+@contextmanager
+def replay(cassette: Cassette, latency: float = 0.0,
+           bandwidth: Optional[float] = None,
+           prefix: str = API_URL) -> Iterator[ReplayServer]:
+    """Serve cassette locally and route requests under prefix to it."""
+    with ReplayServer(cassette, latency, bandwidth) as server:
+        mount_adapter(prefix, ReplayAdapter(server.url))
+        try:
+            yield server
+        finally:
+            unmount_adapter(prefix)
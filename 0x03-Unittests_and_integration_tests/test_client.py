@@ -2,21 +2,36 @@
 """
 Unit tests for the GithubOrgClient class
 """
+import copy
+import json
+import pickle
+import threading
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch, PropertyMock
+from urllib.parse import urlsplit, parse_qs
 from parameterized import parameterized, parameterized_class
 
+import utils
 from client import GithubOrgClient
 from fixtures import org_payload, repos_payload, expected_repos, apache2_repos
 import requests
 
 
-class TestGithubOrgClient(unittest.TestCase):
+class ClientTestCase(unittest.TestCase):
+    """Starts each test with an empty shared cache"""
+
+    def setUp(self):
+        """Clear the cache shared by every GithubOrgClient"""
+        GithubOrgClient.shared_cache.clear()
+
+
+class TestGithubOrgClient(ClientTestCase):
     @parameterized.expand([
         ("google",),
         ("abc",)
     ])
-    @patch('utils.get_json')
+    @patch('client.get_json')
     def test_org(self, org_name, mock_get_json):
         expected_payload = {
             "login": org_name,
@@ -41,6 +56,110 @@ class TestGithubOrgClient(unittest.TestCase):
         )
         self.assertEqual(result, expected_payload)
 
+    @patch('client.get_json')
+    def test_refresh(self, mock_get_json):
+        """Test refresh() makes org be fetched again"""
+        repos_url = "https://api.github.com/orgs/google/repos"
+        old_org = {"login": "old", "repos_url": repos_url}
+        new_org = {"login": "new", "repos_url": repos_url}
+        mock_get_json.side_effect = [old_org, new_org]
+        client = GithubOrgClient("google")
+
+        self.assertEqual(client.org, old_org)
+        self.assertEqual(client.org, old_org)
+        client.refresh()
+        self.assertEqual(client.org, new_org)
+        self.assertEqual(mock_get_json.call_count, 2)
+
+    @patch('client.iter_json_pages')
+    @patch('client.get_json')
+    def test_refresh_drops_shared_entries(self, mock_get_json,
+                                          mock_iter_json_pages):
+        """Test refresh() clears the shared org and repos entries"""
+        repos_url = "https://api.github.com/orgs/google/repos"
+        mock_get_json.return_value = {"repos_url": repos_url}
+        mock_iter_json_pages.side_effect = lambda *args: iter([[{"n": 1}]])
+        GithubOrgClient("google").repos_payload
+
+        GithubOrgClient("google").refresh()
+
+        self.assertIsNone(GithubOrgClient.shared_cache.get(repos_url))
+        self.assertIsNone(GithubOrgClient.shared_cache.get(
+            "https://api.github.com/orgs/google"
+        ))
+        mock_get_json.assert_called_once()
+
+    @patch('client.get_json')
+    def test_refresh_never_fetches(self, mock_get_json):
+        """Test refresh() on a fresh client makes no request"""
+        GithubOrgClient("google").refresh()
+        mock_get_json.assert_not_called()
+        self.assertIsNone(GithubOrgClient.shared_cache.get(
+            "https://api.github.com/orgs/google"
+        ))
+
+    @patch('client.get_json')
+    def test_org_shared_across_instances(self, mock_get_json):
+        """Test a second client for the same org hits the shared cache"""
+        org = {"login": "google", "repos_url": "https://api.github.com/x"}
+        mock_get_json.return_value = org
+
+        self.assertEqual(GithubOrgClient("google").org, org)
+        self.assertEqual(GithubOrgClient("google").org, org)
+        mock_get_json.assert_called_once()
+
+    @patch('client.get_json')
+    def test_pickle_after_memoized_access(self, mock_get_json):
+        """Test a client still pickles and copies once org is memoized"""
+        org = {"login": "google", "repos_url": "https://api.github.com/x"}
+        mock_get_json.return_value = org
+        client = GithubOrgClient("google")
+        self.assertEqual(client.org, org)
+
+        for clone in (pickle.loads(pickle.dumps(client)),
+                      copy.deepcopy(client)):
+            self.assertEqual(clone.org, org)
+        mock_get_json.assert_called_once()
+
+    @patch('client.get_json')
+    def test_failed_fetch_not_shared(self, mock_get_json):
+        """Test an error body is not cached for the next client"""
+        org = {"login": "google", "repos_url": "https://api.github.com/x"}
+        mock_get_json.side_effect = [{"message": "Server Error"}, org]
+
+        with self.assertRaises(KeyError):
+            GithubOrgClient("google").public_repos()
+        self.assertEqual(GithubOrgClient("google").org, org)
+        self.assertEqual(mock_get_json.call_count, 2)
+
+    @patch('client.iter_json_pages')
+    def test_failed_repos_fetch_not_shared(self, mock_iter_json_pages):
+        """Test an error page of repos is refetched by the next client"""
+        org = {"repos_url": "https://api.github.com/orgs/google/repos"}
+        mock_iter_json_pages.side_effect = [
+            iter([{"message": "Not Found"}]),
+            iter([[{"name": "a", "license": None}]]),
+        ]
+        with patch('client.get_json', return_value=org):
+            with self.assertRaises(ValueError):
+                GithubOrgClient("google").repos_payload
+            self.assertEqual(GithubOrgClient("google").public_repos(), ["a"])
+
+    @patch('client.iter_json_pages')
+    def test_shared_payloads_are_copies(self, mock_iter_json_pages):
+        """Test one client mutating its payload leaves the others alone"""
+        repos_url = "https://api.github.com/orgs/google/repos"
+        mock_iter_json_pages.return_value = iter([[{"name": "a"}]])
+        with patch('client.get_json', return_value={"repos_url": repos_url}):
+            first = GithubOrgClient("google")
+            first.repos_payload[0]["name"] = "changed"
+            first.repos_payload.append({"name": "b"})
+            first.org["repos_url"] = "changed"
+
+            second = GithubOrgClient("google")
+            self.assertEqual(second.org, {"repos_url": repos_url})
+            self.assertEqual(second.public_repos(), ["a"])
+
     def test_public_repos_url(self):
         mocked_payload = {
             "repos_url": "https://api.github.com/orgs/google/repos"
@@ -54,14 +173,14 @@ class TestGithubOrgClient(unittest.TestCase):
             repos_url = client._public_repos_url
             self.assertEqual(repos_url, mocked_payload["repos_url"])
 
-    @patch('utils.get_json')
-    def test_public_repos(self, mock_get_json):
+    @patch('client.iter_json_pages')
+    def test_public_repos(self, mock_iter_json_pages):
         mocked_repos_payload = [
             {"name": "repo1", "license": {"key": "mit"}},
             {"name": "repo2", "license": {"key": "apache-2.0"}},
             {"name": "repo3", "license": {"key": "bsd"}},
         ]
-        mock_get_json.return_value = mocked_repos_payload
+        mock_iter_json_pages.return_value = iter([mocked_repos_payload])
 
         client = GithubOrgClient("google")
 
@@ -78,10 +197,50 @@ class TestGithubOrgClient(unittest.TestCase):
 
             mock_repos_url.assert_called_once()
 
-        mock_get_json.assert_called_once_with(
-            "https://api.github.com/orgs/google/repos"
+        mock_iter_json_pages.assert_called_once_with(
+            "https://api.github.com/orgs/google/repos", {"per_page": 100}
         )
 
+    @patch('client.iter_json_pages')
+    def test_iter_public_repos_streams_pages(self, mock_iter_json_pages):
+        """Test names are yielded from each page as it arrives"""
+        def pages():
+            yield [{"name": "repo1", "license": {"key": "mit"}}]
+            raise AssertionError("second page requested too early")
+
+        mock_iter_json_pages.return_value = pages()
+        client = GithubOrgClient("google")
+
+        with patch.object(
+            GithubOrgClient, "_public_repos_url", new_callable=PropertyMock
+        ) as mock_repos_url:
+            mock_repos_url.return_value = (
+                "https://api.github.com/orgs/google/repos"
+            )
+            repos = client.iter_public_repos(license="mit")
+            self.assertEqual(next(repos), "repo1")
+
+    def test_license_index(self):
+        """Test license lookups share one index per repos_payload"""
+        first_payload = [
+            {"name": "repo1", "license": {"key": "mit"}},
+            {"name": "repo2", "license": None},
+            {"name": "repo3", "license": {"key": "mit"}},
+        ]
+        second_payload = [{"name": "repo4", "license": {"key": "mit"}}]
+        client = GithubOrgClient("google")
+
+        with patch.object(
+            GithubOrgClient, "repos_payload", new_callable=PropertyMock
+        ) as mock_payload:
+            mock_payload.return_value = first_payload
+            self.assertEqual(client.public_repos("mit"), ["repo1", "repo3"])
+            self.assertEqual(client.public_repos("bsd"), [])
+            self.assertIs(client.license_index, client.license_index)
+
+            mock_payload.return_value = second_payload
+            self.assertEqual(client.public_repos("mit"), ["repo4"])
+
     @parameterized.expand([
         ({"license": {"key": "my_license"}}, "my_license", True),
         ({"license": {"key": "other_license"}}, "my_license", False),
@@ -107,23 +266,29 @@ class TestGithubOrgClient(unittest.TestCase):
         "apache2_repos": apache2_repos
     }
 ])
-class TestIntegrationGithubOrgClient(unittest.TestCase):
+class TestIntegrationGithubOrgClient(ClientTestCase):
     """Integration tests for GithubOrgClient with real logic and mocked HTTP"""
 
     @classmethod
     def setUpClass(cls):
-        """Patch requests.get and configure its side_effect"""
-        cls.get_patcher = patch('requests.get')
+        """Patch Session.get and configure its side_effect"""
+        cls.get_patcher = patch('requests.Session.get')
         mocked_get = cls.get_patcher.start()
 
-        def mocked_get_side_effect(url):
+        def mocked_get_side_effect(url, **kwargs):
             class MockResponse:
+                status_code = 200
+                ok = True
+                headers = {}
+                links = {}
+
                 def __init__(self, payload):
                     self._payload = payload
 
                 def json(self):
                     return self._payload
 
+            url = url.split("?")[0]
             if url == "https://api.github.com/orgs/google":
                 return MockResponse(cls.org_payload)
             elif url == "https://api.github.com/orgs/google/repos":
@@ -135,7 +300,7 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
 
     @classmethod
     def tearDownClass(cls):
-        """Stop patching requests.get"""
+        """Stop patching Session.get"""
         cls.get_patcher.stop()
 
     def test_public_repos(self):
@@ -150,3 +315,149 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
             client.public_repos(license="apache-2.0"),
             self.apache2_repos
         )
+
+
+class StubGithubHandler(BaseHTTPRequestHandler):
+    """Serves two pages of repos per org, like the GitHub API."""
+    rate_limited = set()
+    throttled = 0  # 429 responses sent
+
+    @classmethod
+    def reset(cls):
+        """Forget the rate limits already sent"""
+        cls.rate_limited = set()
+        cls.throttled = 0
+
+    def do_GET(self):
+        """Answer /orgs/<org> and /orgs/<org>/repos"""
+        parts = urlsplit(self.path)
+        segments = parts.path.strip("/").split("/")
+        base = "http://{}:{}".format(*self.server.server_address)
+        org = segments[1]
+
+        if org == "missing":
+            return self._send(404, {"message": "Not Found"})
+        if org == "limited" and org not in self.rate_limited:
+            self.rate_limited.add(org)
+            return self._send(403, {"message": "slow down"},
+                              {"Retry-After": "0"})
+        if org == "throttled" and org not in self.rate_limited:
+            self.rate_limited.add(org)
+            type(self).throttled += 1
+            return self._send(429, {"message": "too many requests"},
+                              {"Retry-After": "0"})
+        if org == "bare" and org not in self.rate_limited:
+            self.rate_limited.add(org)
+            return self._send(429, {"message": "too many requests"})
+        if len(segments) == 2:
+            return self._send(200, {
+                "login": org,
+                "repos_url": "{}/orgs/{}/repos".format(base, org),
+            })
+
+        page = int(parse_qs(parts.query).get("page", ["1"])[0])
+        if page == 1:
+            link = '<{}/orgs/{}/repos?per_page=100&page=2>; rel="next"'
+            return self._send(
+                200,
+                [{"name": org + "-a", "license": {"key": "mit"}}],
+                {"Link": link.format(base, org)},
+            )
+        return self._send(200, [{"name": org + "-b", "license": None}])
+
+    def _send(self, status, payload, headers=None):
+        """Write a JSON response"""
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keep test output quiet"""
+
+
+class TestFetchMany(ClientTestCase):
+    """Tests for GithubOrgClient.fetch_many against a local stub server"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start the stub server and point the client at it"""
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubGithubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url_patcher = patch.object(
+            GithubOrgClient, "ORG_URL",
+            "http://127.0.0.1:{}/orgs/{{org}}".format(cls.server.server_port)
+        )
+        cls.url_patcher.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the stub server"""
+        cls.url_patcher.stop()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        """Reset the stub and the host rate limiter between tests"""
+        super().setUp()
+        StubGithubHandler.reset()
+        limiter = patch.object(utils, "_rate_limiter", utils.HostRateLimiter())
+        limiter.start()
+        self.addCleanup(limiter.stop)
+
+    def test_fetch_many(self):
+        """Test every org is fetched, across pages, with errors reported"""
+        orgs = ["org{}".format(i) for i in range(10)] + ["missing"]
+        results = {
+            org: (repos, error)
+            for org, repos, error in GithubOrgClient.fetch_many(
+                orgs, max_workers=4
+            )
+        }
+
+        self.assertEqual(set(results), set(orgs))
+        self.assertEqual(results["org3"], (["org3-a", "org3-b"], None))
+        self.assertIsNone(results["missing"][0])
+        self.assertIsInstance(results["missing"][1], KeyError)
+
+    def test_fetch_many_with_license(self):
+        """Test license filtering is applied per org"""
+        results = list(GithubOrgClient.fetch_many(["org1"], license="mit"))
+        self.assertEqual(results, [("org1", ["org1-a"], None)])
+
+    def test_iter_public_repos_streams(self):
+        """Test streamed, projected pages are followed to the end"""
+        client = GithubOrgClient("org2")
+        self.assertEqual(list(client.iter_public_repos()),
+                         ["org2-a", "org2-b"])
+        self.assertEqual(list(client.iter_public_repos(license="mit")),
+                         ["org2-a"])
+
+    def test_retries_after_rate_limit(self):
+        """Test a 403 with Retry-After is waited out and retried"""
+        results = list(GithubOrgClient.fetch_many(["limited"]))
+        self.assertEqual(
+            results, [("limited", ["limited-a", "limited-b"], None)]
+        )
+
+    def test_retries_after_429(self):
+        """Test a 429 with Retry-After is retried once, by the limiter"""
+        with patch("utils._rate_limiter.update",
+                   wraps=utils._rate_limiter.update) as update:
+            results = list(GithubOrgClient.fetch_many(["throttled"]))
+        self.assertEqual(
+            results, [("throttled", ["throttled-a", "throttled-b"], None)]
+        )
+        self.assertEqual(StubGithubHandler.throttled, 1)
+        statuses = [call.args[1].status_code for call in update.call_args_list]
+        self.assertEqual(statuses[0], 429)
+
+    def test_retries_after_bare_429(self):
+        """Test a 429 without rate-limit headers is backed off and retried"""
+        with patch.object(utils._rate_limiter, "backoff", 0.01):
+            results = list(GithubOrgClient.fetch_many(["bare"]))
+        self.assertEqual(results, [("bare", ["bare-a", "bare-b"], None)])
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Tests for the record/replay transport in replay.py
+"""
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from client import GithubOrgClient
+from fixtures import expected_repos, apache2_repos
+from replay import Cassette, ReplayServer, record, replay
+from utils import get_json, get_session
+
+
+class TestReplay(unittest.TestCase):
+    """Tests for Cassette, replay and record"""
+
+    def setUp(self):
+        """Start each test with an empty shared cache"""
+        GithubOrgClient.shared_cache.clear()
+
+    def test_public_repos_from_fixtures(self):
+        """Test synthetic orgs replay the fixture repos"""
+        cassette = Cassette.from_fixtures(orgs=3)
+        self.assertEqual(cassette.orgs(), ["org0", "org1", "org2"])
+
+        with replay(cassette) as server:
+            client = GithubOrgClient("org1")
+            self.assertEqual(client.public_repos(), expected_repos)
+            self.assertEqual(
+                client.public_repos(license="apache-2.0"), apache2_repos
+            )
+        self.assertEqual(server.requests, 2)
+
+    def test_pagination(self):
+        """Test padded orgs are split into linked pages"""
+        cassette = Cassette.from_fixtures(orgs=1, per_page=4,
+                                          repos_per_org=10)
+        with replay(cassette) as server, \
+                patch.object(GithubOrgClient, "PER_PAGE", 4):
+            repos = GithubOrgClient("org0").public_repos()
+        self.assertEqual(len(repos), 10)
+        self.assertEqual(len(set(repos)), 10)
+        self.assertEqual(server.requests, 4)
+
+    def test_unknown_org(self):
+        """Test paths missing from the cassette get a 404"""
+        with replay(Cassette()):
+            self.assertEqual(
+                get_json("https://api.github.com/orgs/nobody"),
+                {"message": "Not Found"}
+            )
+
+    def test_latency(self):
+        """Test latency is added to each response"""
+        with replay(Cassette.from_fixtures(orgs=1), latency=0.05):
+            start = time.monotonic()
+            get_json("https://api.github.com/orgs/org0")
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_unmounted_after_replay(self):
+        """Test requests stop being redirected when replay exits"""
+        with replay(Cassette()):
+            replayed = get_session().get_adapter("https://api.github.com/")
+        self.assertIsNot(
+            get_session().get_adapter("https://api.github.com/"), replayed
+        )
+
+    def test_record_and_save(self):
+        """Test recorded responses replay the same payloads"""
+        source = Cassette.from_fixtures(orgs=1)
+        recorded = Cassette()
+        with ReplayServer(source) as server:
+            with record(recorded, prefix=server.url + "/"):
+                org = get_json(server.url + "/orgs/org0")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cassette.json")
+            recorded.save(path)
+            loaded = Cassette.load(path)
+
+        self.assertEqual(len(loaded), 1)
+        with replay(loaded):
+            self.assertEqual(
+                get_json("https://api.github.com/orgs/org0"), org
+            )
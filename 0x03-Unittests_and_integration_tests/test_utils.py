@@ -1,11 +1,35 @@
 #!/usr/bin/env python3
 """Unit tests for utils.access_nested_map and utils.get_json
 """
+import asyncio
+import copy
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
 import unittest
 from parameterized import parameterized
 from unittest.mock import patch, Mock
 
-from utils import access_nested_map, get_json, memoize
+import utils
+from utils import (
+    access_nested_map,
+    compile_path,
+    extract_many,
+    project,
+    iter_json_array,
+    get_json,
+    iter_json_pages,
+    get_session,
+    memoize,
+    HostRateLimiter,
+    LRUCache,
+    SQLiteCache,
+    HTTPCache,
+    set_http_cache,
+)
 
 
 class TestAccessNestedMap(unittest.TestCase):
@@ -31,6 +55,41 @@ class TestAccessNestedMap(unittest.TestCase):
         self.assertEqual(str(context.exception), repr(expected_key))
 
 
+class TestCompilePath(unittest.TestCase):
+    """Tests for compile_path and extract_many."""
+
+    @parameterized.expand([
+        ({"a": 1}, ("a",), 1),
+        ({"a": {"b": 2}}, ("a",), {"b": 2}),
+        ({"a": {"b": 2}}, ("a", "b"), 2),
+        ({"a": {"b": {"c": 3}}}, ("a", "b", "c"), 3),
+        ({1: {"b": 2}}, (1, "b"), 2),
+    ])
+    def test_compile_path(self, nested_map, path, expected):
+        """Test compiled getters match access_nested_map."""
+        self.assertEqual(compile_path(path)(nested_map), expected)
+
+    @parameterized.expand([
+        ({}, ("a",), 'a'),
+        ({"a": 1}, ("a", "b"), 'b'),
+        ({"a": "text"}, ("a", "b"), 'b'),
+        ({"a": [1]}, ("a", 0), 0),
+    ])
+    def test_compile_path_exception(self, nested_map, path, expected_key):
+        """Test compiled getters raise the same KeyError."""
+        with self.assertRaises(KeyError) as context:
+            compile_path(path)(nested_map)
+        self.assertEqual(str(context.exception), repr(expected_key))
+
+    def test_extract_many_default(self):
+        """Test missing paths yield the default."""
+        records = [{"license": {"key": "mit"}}, {"license": None}, {}]
+        self.assertEqual(
+            extract_many(records, ("license", "key"), default=None),
+            ["mit", None, None]
+        )
+
+
 class TestGetJson(unittest.TestCase):
     """Tests for get_json."""
 
@@ -48,17 +107,429 @@ class TestGetJson(unittest.TestCase):
         """Test get_json returns expected payload from URL."""
         mock_response = Mock()
         mock_response.json.return_value = test_payload
+        mock_session = Mock()
+        mock_session.get.return_value = mock_response
 
-        with patch(
-            'utils.requests.get',
-            return_value=mock_response
-        ) as mock_get:
+        with patch('utils.get_session', return_value=mock_session):
             result = get_json(test_url)
 
-            mock_get.assert_called_once_with(test_url)
+            mock_session.get.assert_called_once_with(
+                test_url, timeout=utils.TIMEOUT
+            )
             self.assertEqual(result, test_payload)
 
 
+class TestIterJsonPages(unittest.TestCase):
+    """Tests for iter_json_pages."""
+
+    def test_follows_next_links(self):
+        """Test pages are fetched by following rel="next" links."""
+        first = Mock(status_code=200, headers={}, links={
+            "next": {"url": "https://x/repos?per_page=2&page=2"}
+        })
+        first.json.return_value = [1, 2]
+        last = Mock(status_code=200, headers={}, links={})
+        last.json.return_value = [3]
+        mock_session = Mock()
+        mock_session.get.side_effect = [first, last]
+
+        with patch('utils.get_session', return_value=mock_session):
+            pages = list(iter_json_pages("https://x/repos", {"per_page": 2}))
+
+        self.assertEqual(pages, [[1, 2], [3]])
+        self.assertEqual(
+            [call.args[0] for call in mock_session.get.call_args_list],
+            ["https://x/repos?per_page=2", "https://x/repos?per_page=2&page=2"]
+        )
+
+
+class TestIterJsonArray(unittest.TestCase):
+    """Tests for iter_json_array and project."""
+
+    def test_split_anywhere(self):
+        """Test elements are parsed whatever the chunk boundaries."""
+        data = json.dumps([
+            {"name": "caf\u00e9", "license": {"key": "mit"}},
+            12345,
+            "x, ]",
+            [],
+        ], ensure_ascii=False).encode()
+        for size in (1, 2, 3, 7, len(data)):
+            chunks = [data[i:i + size] for i in range(0, len(data), size)]
+            self.assertEqual(
+                list(iter_json_array(chunks)), json.loads(data)
+            )
+
+    def test_split_at_every_byte(self):
+        """Test numbers split across chunks are read whole."""
+        data = b'[1.5, -3e5, 2E-2, 10, 0.25e+1, -0, 7]'
+        for cut in range(1, len(data)):
+            chunks = [data[:cut], data[cut:]]
+            self.assertEqual(
+                list(iter_json_array(chunks)), json.loads(data), cut
+            )
+
+    @parameterized.expand([
+        ("fraction", [b"[1.", b"5]"], [1.5]),
+        ("exponent", [b"[1e", b"5]"], [1e5]),
+        ("negative_exponent", [b"[-3e", b"5, 2]"], [-3e5, 2]),
+        ("last_chunk", [b"[1", b"2", b"]"], [12]),
+    ])
+    def test_split_number(self, _, chunks, expected):
+        """Test a number cut mid-way waits for the rest of it."""
+        self.assertEqual(list(iter_json_array(chunks)), expected)
+
+    def test_yields_before_end(self):
+        """Test an element is yielded before the rest has arrived."""
+        def chunks():
+            yield b'[{"a": 1}, '
+            raise AssertionError("read too far")
+
+        self.assertEqual(next(iter_json_array(chunks())), {"a": 1})
+
+    def test_paths(self):
+        """Test elements are reduced to the requested paths."""
+        data = b'[{"name": "a", "license": {"key": "mit", "url": "u"}},' \
+            b' {"name": "b", "license": null}, {"id": 3}]'
+        self.assertEqual(
+            list(iter_json_array([data], [("name",), ("license", "key")])),
+            [{"name": "a", "license": {"key": "mit"}},
+             {"name": "b"},
+             {}]
+        )
+
+    def test_project(self):
+        """Test project copies nested values and skips missing ones."""
+        self.assertEqual(
+            project({"a": {"b": 1, "c": 2}, "d": 3}, [("a", "b"), ("e",)]),
+            {"a": {"b": 1}}
+        )
+
+    @parameterized.expand([
+        ("empty", [b" [ ] "], []),
+        ("nested", [b"[[1, [2]], {}]"], [[1, [2]], {}]),
+    ])
+    def test_valid(self, _, chunks, expected):
+        """Test edge cases that parse."""
+        self.assertEqual(list(iter_json_array(chunks)), expected)
+
+    @parameterized.expand([
+        ("object", [b'{"a": 1}']),
+        ("truncated", [b"[1, 2"]),
+        ("trailing_comma", [b"[1, ]"]),
+        ("missing_comma", [b"[1 2]"]),
+        ("bad_number", [b"[1.", b"]"]),
+        ("extra_data", [b"[1]", b" 2"]),
+        ("empty_input", []),
+    ])
+    def test_invalid(self, _, chunks):
+        """Test malformed input raises ValueError."""
+        with self.assertRaises(ValueError):
+            list(iter_json_array(chunks))
+
+    def test_get_json_paths(self):
+        """Test get_json streams and projects when given paths."""
+        response = Mock(links={})
+        response.__enter__ = Mock(return_value=response)
+        response.__exit__ = Mock(return_value=False)
+        response.iter_content.return_value = [
+            b'[{"name": "a", "size": 1', b'0}, {"name": "b"}]'
+        ]
+        mock_session = Mock()
+        mock_session.get.return_value = response
+
+        with patch('utils.get_session', return_value=mock_session):
+            result = get_json("http://example.com", paths=[("name",)])
+
+        self.assertEqual(result, [{"name": "a"}, {"name": "b"}])
+        mock_session.get.assert_called_once_with(
+            "http://example.com", timeout=utils.TIMEOUT, stream=True
+        )
+        response.json.assert_not_called()
+
+
+class TestHostRateLimiter(unittest.TestCase):
+    """Tests for HostRateLimiter."""
+
+    def setUp(self):
+        """Use a fake clock that sleeping advances."""
+        self.now = 1000.0
+        self.sleeps = []
+
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+        self.limiter = HostRateLimiter(clock=lambda: self.now, sleep=sleep,
+                                       jitter=lambda: 1.0)
+
+    def test_exhausted_quota_blocks_host_until_reset(self):
+        """Test X-RateLimit-Remaining: 0 delays the next request."""
+        response = Mock(status_code=200, headers={
+            "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "1030",
+        })
+        self.assertFalse(self.limiter.update("https://a/x", response))
+
+        self.limiter.wait("https://b/x")
+        self.assertEqual(self.sleeps, [])
+        self.limiter.wait("https://a/y")
+        self.assertEqual(self.sleeps, [30.0])
+
+    @parameterized.expand([
+        (403, True),
+        (429, True),
+        (200, False),
+    ])
+    def test_retry_after(self, status_code, expected_retry):
+        """Test Retry-After on a rejection asks for a retry."""
+        response = Mock(status_code=status_code,
+                        headers={"Retry-After": "5"})
+        self.assertEqual(
+            self.limiter.update("https://a/x", response), expected_retry
+        )
+
+    def test_bare_429_backs_off_exponentially(self):
+        """Test a 429 without headers is retried after a growing delay."""
+        throttled = Mock(status_code=429, headers={})
+        for expected in (0.5, 1.0, 2.0):
+            self.assertTrue(self.limiter.update("https://a/x", throttled))
+            self.limiter.wait("https://a/x")
+            self.assertEqual(self.sleeps[-1], expected)
+
+        # Any other response resets the backoff
+        self.limiter.update("https://a/x", Mock(status_code=200, headers={}))
+        self.limiter.update("https://a/x", throttled)
+        self.limiter.wait("https://a/x")
+        self.assertEqual(self.sleeps[-1], 0.5)
+
+    def test_bare_429_backoff_is_capped_and_jittered(self):
+        """Test the delay stays within [max_backoff / 2, max_backoff]."""
+        limiter = HostRateLimiter(clock=lambda: self.now, max_backoff=4.0,
+                                  jitter=lambda: 0.0)
+        throttled = Mock(status_code=429, headers={})
+        for _ in range(10):
+            limiter.update("https://a/x", throttled)
+        self.assertEqual(limiter._blocked_until["a"], self.now + 2.0)
+
+    def test_bare_403_not_retried(self):
+        """Test a 403 without rate-limit headers is a plain refusal."""
+        response = Mock(status_code=403, headers={})
+        self.assertFalse(self.limiter.update("https://a/x", response))
+
+
+class TestGetSession(unittest.TestCase):
+    """Tests for get_session."""
+
+    def test_session_reused_within_thread(self):
+        """Test the same session is returned on repeated calls."""
+        self.assertIs(get_session(), get_session())
+
+    def test_sessions_share_adapter_across_threads(self):
+        """Test each thread gets its own session over one shared pool."""
+        sessions = []
+        thread = threading.Thread(
+            target=lambda: sessions.append(get_session())
+        )
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(sessions[0], get_session())
+        self.assertIs(
+            sessions[0].get_adapter("https://api.github.com"),
+            get_session().get_adapter("https://api.github.com"),
+        )
+
+
+class TestLRUCache(unittest.TestCase):
+    """Tests for LRUCache."""
+
+    def test_evicts_least_recently_used(self):
+        """Test the entry not read for longest is evicted first."""
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(
+            [cache.get(key) for key in "abc"], [1, None, 3]
+        )
+
+    def test_ttl(self):
+        """Test entries expire after ttl seconds."""
+        cache = LRUCache(ttl=5)
+        with patch('utils.time.monotonic', return_value=0.0) as clock:
+            cache.set("a", 1)
+            clock.return_value = 4.9
+            self.assertEqual(cache.get("a"), 1)
+            clock.return_value = 5.0
+            self.assertEqual(cache.get("a", "missing"), "missing")
+
+
+class TestSQLiteCache(unittest.TestCase):
+    """Tests for SQLiteCache."""
+
+    def setUp(self):
+        """Use a fresh cache file."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "cache.db")
+
+    def tearDown(self):
+        """Remove the cache file."""
+        self.tmp_dir.cleanup()
+
+    def test_shared_between_instances(self):
+        """Test two caches on one file (e.g. two processes) share data."""
+        writer = SQLiteCache(self.path)
+        reader = SQLiteCache(self.path)
+        writer.set("https://a", {"login": "google"})
+        self.assertEqual(reader.get("https://a"), {"login": "google"})
+        reader.delete("https://a")
+        self.assertIsNone(writer.get("https://a"))
+
+    def test_evicts_least_recently_used(self):
+        """Test the cache keeps at most maxsize entries."""
+        cache = SQLiteCache(self.path, maxsize=2)
+        with patch('utils.time.time') as clock:
+            for now, key in enumerate("ab"):
+                clock.return_value = now
+                cache.set(key, now)
+            clock.return_value = 2
+            cache.get("a")
+            clock.return_value = 3
+            cache.set("c", 3)
+        self.assertEqual(
+            [cache.get(key) for key in "abc"], [0, None, 3]
+        )
+
+
+class TestHTTPCache(unittest.TestCase):
+    """Tests for HTTPCache and conditional requests in get_json."""
+
+    def setUp(self):
+        """Install a cache in a fresh temporary directory."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = HTTPCache(self.tmp_dir.name)
+        set_http_cache(self.cache)
+
+    def tearDown(self):
+        """Uninstall the cache."""
+        set_http_cache(None)
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def _response(status_code, payload=None, headers=None):
+        """Build a mock response."""
+        response = Mock(status_code=status_code, headers=headers or {},
+                        links={})
+        response.ok = status_code < 400
+        response.json.return_value = payload
+        return response
+
+    def test_not_modified_served_from_disk(self):
+        """Test a 304 revalidation returns the stored body."""
+        url = "https://api.github.com/orgs/google"
+        mock_session = Mock()
+        mock_session.get.side_effect = [
+            self._response(200, {"login": "google"}, {"ETag": '"abc"'}),
+            self._response(304),
+        ]
+
+        with patch('utils.get_session', return_value=mock_session):
+            first = get_json(url)
+            second = get_json(url)
+
+        self.assertEqual(first, {"login": "google"})
+        self.assertEqual(second, {"login": "google"})
+        mock_session.get.assert_called_with(
+            url, timeout=utils.TIMEOUT, headers={"If-None-Match": '"abc"'}
+        )
+
+    def test_response_without_validators_not_stored(self):
+        """Test responses without ETag/Last-Modified are not cached."""
+        self.cache.put("https://a", {"a": 1})
+        self.assertEqual(self.cache.get("https://a")["body"], {"a": 1})
+
+        mock_session = Mock()
+        mock_session.get.return_value = self._response(200, {"b": 2})
+        with patch('utils.get_session', return_value=mock_session):
+            get_json("https://b")
+        self.assertIsNone(self.cache.get("https://b"))
+
+    def test_least_recently_used_evicted(self):
+        """Test the oldest entry is dropped when over max_bytes."""
+        for url in ("https://a", "https://b"):
+            self.cache.put(url, {"data": "x" * 100}, etag="1")
+        os.utime(self.cache._path("https://a"), (1, 1))
+        self.cache.max_bytes = os.path.getsize(self.cache._path("https://b"))
+
+        self.cache.put("https://b", {"data": "x" * 100}, etag="2")
+
+        self.assertIsNone(self.cache.get("https://a"))
+        self.assertIsNotNone(self.cache.get("https://b"))
+
+    def test_put_does_not_rescan_directory(self):
+        """Test eviction works from the running total, not a rescan."""
+        self.cache.max_bytes = 0
+        with patch('utils.os.scandir') as scandir, \
+                patch('utils.os.listdir') as listdir:
+            self.cache.put("https://a", {"a": 1}, etag="1")
+        scandir.assert_not_called()
+        listdir.assert_not_called()
+        self.assertIsNone(self.cache.get("https://a"))
+        self.assertEqual(self.cache._total, 0)
+
+    def test_existing_entries_counted(self):
+        """Test a new cache picks up the size and order already on disk."""
+        for url in ("https://a", "https://b"):
+            self.cache.put(url, {"data": "x" * 100}, etag="1")
+        os.utime(self.cache._path("https://b"), (1, 1))
+        size = os.path.getsize(self.cache._path("https://a"))
+
+        cache = HTTPCache(self.tmp_dir.name, max_bytes=2 * size)
+        self.assertEqual(cache._total, 2 * size)
+        cache.put("https://c", {"data": "x" * 100}, etag="1")
+
+        self.assertIsNone(cache.get("https://b"))
+        self.assertIsNotNone(cache.get("https://a"))
+
+    def test_other_writers_counted_after_rescan(self):
+        """Test entries written by another process are evicted too."""
+        other = HTTPCache(self.tmp_dir.name)
+        other.put("https://a", {"data": "x" * 100}, etag="1")
+        os.utime(other._path("https://a"), (1, 1))
+        size = os.path.getsize(other._path("https://a"))
+
+        self.cache.max_bytes = size
+        self.cache.put("https://b", {"data": "x" * 100}, etag="1")
+        self.assertIsNotNone(self.cache.get("https://a"))  # Not seen yet
+
+        self.cache.rescan_interval = 0
+        self.cache._next_scan = 0
+        self.cache.put("https://b", {"data": "x" * 100}, etag="2")
+        self.assertIsNone(self.cache.get("https://a"))
+        self.assertIsNotNone(self.cache.get("https://b"))
+
+    def test_temp_file_names_include_pid(self):
+        """Test concurrent writers in different processes never collide."""
+        with patch('utils.os.getpid', return_value=4321), \
+                patch('utils.os.replace') as replace:
+            self.cache.put("https://a", {"a": 1}, etag="1")
+        tmp_path = replace.call_args[0][0]
+        self.assertIn(".4321.", os.path.basename(tmp_path))
+        os.remove(tmp_path)
+
+
+class _Picklable:
+    """Module level, so pickle can find it."""
+    calls = 0
+
+    @memoize
+    def a_property(self):
+        """Count calls"""
+        self.calls += 1
+        return self.calls
+
+
 class TestMemoize(unittest.TestCase):
     """Tests for memoize decorator."""
 
@@ -86,3 +557,157 @@ class TestMemoize(unittest.TestCase):
             self.assertEqual(result2, 42)
 
             mocked_method.assert_called_once()
+
+    def test_memoize_ttl(self):
+        """Test a memoized value is recomputed once its ttl expires."""
+        class TestClass:
+            calls = 0
+
+            @memoize(ttl=10)
+            def a_property(self):
+                self.calls += 1
+                return self.calls
+
+        test_obj = TestClass()
+        with patch('utils.time.monotonic', return_value=100.0) as clock:
+            self.assertEqual(test_obj.a_property, 1)
+            clock.return_value = 109.0
+            self.assertEqual(test_obj.a_property, 1)
+            clock.return_value = 110.0
+            self.assertEqual(test_obj.a_property, 2)
+
+    def test_memoize_invalidate(self):
+        """Test invalidate() drops the cached value of one instance."""
+        class TestClass:
+            calls = 0
+
+            @memoize
+            def a_property(self):
+                self.calls += 1
+                return self.calls
+
+        first, second = TestClass(), TestClass()
+        self.assertEqual((first.a_property, second.a_property), (1, 1))
+        TestClass.a_property.invalidate(first)
+        self.assertEqual((first.a_property, second.a_property), (2, 1))
+
+    def test_memoize_single_computation_across_threads(self):
+        """Test concurrent first accesses compute the value once."""
+        class TestClass:
+            calls = 0
+
+            @memoize
+            def a_property(self):
+                self.calls += 1
+                time.sleep(0.05)
+                return 42
+
+        test_obj = TestClass()
+        results = []
+
+        def read():
+            results.append(test_obj.a_property)
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(test_obj.calls, 1)
+
+    def test_memoize_coroutine(self):
+        """Test coroutine methods are awaited once and shared."""
+        class TestClass:
+            calls = 0
+
+            @memoize
+            async def a_property(self):
+                self.calls += 1
+                await asyncio.sleep(0)
+                return 42
+
+        async def main():
+            test_obj = TestClass()
+            results = await asyncio.gather(
+                test_obj.a_property, test_obj.a_property
+            )
+            results.append(await test_obj.a_property)
+            return test_obj, results
+
+        test_obj, results = asyncio.run(main())
+        self.assertEqual(results, [42, 42, 42])
+        self.assertEqual(test_obj.calls, 1)
+
+    def test_memoize_coroutine_across_event_loops(self):
+        """Test a cached result is awaitable from a later event loop."""
+        class TestClass:
+            calls = 0
+
+            @memoize
+            async def a_property(self):
+                self.calls += 1
+                await asyncio.sleep(0)
+                return self.calls
+
+        async def read(test_obj):
+            return await test_obj.a_property
+
+        test_obj = TestClass()
+        self.assertEqual(asyncio.run(read(test_obj)), 1)
+        self.assertEqual(asyncio.run(read(test_obj)), 1)
+
+        # A task left pending on a closed loop is not awaited again
+        async def abandon(test_obj):
+            test_obj.a_property
+
+        other = TestClass()
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(abandon(other))
+        loop.close()
+        self.assertEqual(asyncio.run(read(other)), 2)
+
+    def test_memoize_coroutine_invalidated_while_running(self):
+        """Test a result computed before invalidate() is not cached."""
+        class TestClass:
+            calls = 0
+
+            @memoize
+            async def a_property(self):
+                self.calls += 1
+                calls = self.calls
+                await asyncio.sleep(0)
+                return calls
+
+        async def main():
+            test_obj = TestClass()
+            first = test_obj.a_property
+            TestClass.a_property.invalidate(test_obj)
+            self.assertEqual(await first, 1)
+            await asyncio.sleep(0)
+            return await test_obj.a_property
+
+        self.assertEqual(asyncio.run(main()), 2)
+
+    def test_memoize_without_weakref_slot(self):
+        """Test classes whose instances can't be weakly referenced work."""
+        class TestClass:
+            __slots__ = ("__dict__",)
+
+            @memoize
+            def a_property(self):
+                return 42
+
+        test_obj = TestClass()
+        self.assertEqual(test_obj.a_property, 42)
+        self.assertEqual(test_obj.a_property, 42)
+
+    def test_memoize_pickles(self):
+        """Test a memoized instance pickles and copies with its value."""
+        test_obj = _Picklable()
+        self.assertEqual(test_obj.a_property, 1)
+        for clone in (pickle.loads(pickle.dumps(test_obj)),
+                      copy.deepcopy(test_obj)):
+            self.assertEqual(clone.a_property, 1)
+            self.assertEqual(clone.calls, 1)
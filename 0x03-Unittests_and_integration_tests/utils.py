@@ -1,22 +1,96 @@
 #!/usr/bin/env python3
 """Generic utilities for github org client.
 """
+import asyncio
+import codecs
+import hashlib
+import inspect
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
 import requests
+from email.utils import parsedate_to_datetime
+from collections import OrderedDict
 from functools import wraps
+from operator import itemgetter
+from urllib.parse import urlencode, urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import (
     Mapping,
     Sequence,
     Any,
     Dict,
     Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
 )
 
 __all__ = [
     "access_nested_map",
+    "compile_path",
+    "extract_many",
+    "project",
+    "iter_json_array",
     "get_json",
+    "iter_json_pages",
+    "get_session",
+    "mount_adapter",
+    "unmount_adapter",
+    "HostRateLimiter",
+    "LRUCache",
+    "SQLiteCache",
+    "HTTPCache",
+    "set_http_cache",
     "memoize",
+    "MemoizedProperty",
 ]
 
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+POOL_SIZE = 32
+CHUNK_SIZE = 64 * 1024
+RATE_LIMIT_RETRIES = 2
+
+
+class _Retry(Retry):
+    """Retry that leaves 429 to HostRateLimiter.
+    The limiter holds back every thread requesting the host; retrying
+    here would sleep per thread and multiply the requests sent to an
+    already throttled host. urllib3 retries any status in this set that
+    carries Retry-After, whatever status_forcelist says.
+    """
+    RETRY_AFTER_STATUS_CODES = frozenset({413, 503})
+
+
+_retries = _Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(500, 502, 503, 504),
+    allowed_methods=frozenset({"GET"}),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+# One adapter, and so one connection pool per host, shared by every session
+_adapter = HTTPAdapter(pool_maxsize=POOL_SIZE, max_retries=_retries)
+_local = threading.local()
+_mounts = {}  # URL prefix -> adapter, mounted on every thread's session
+_mounts_version = 0
+_mounts_lock = threading.Lock()
+_http_cache = None
+_MISSING = object()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_CHARS = frozenset("0123456789.eE+-")
+
 
 def access_nested_map(nested_map: Mapping, path: Sequence) -> Any:
     """Access nested map with key path.
@@ -40,15 +114,709 @@ def access_nested_map(nested_map: Mapping, path: Sequence) -> Any:
     return nested_map
 
 
-def get_json(url: str) -> Dict:
+def _chain_lookup(path: Tuple) -> Callable[[Mapping], Any]:
+    """Build the plain subscription chain for path."""
+    if not path:
+        return lambda nested_map: nested_map
+    if len(path) == 1:
+        return itemgetter(path[0])
+    if len(path) == 2:
+        first, second = path
+        return lambda nested_map: nested_map[first][second]
+
+    def lookup(nested_map: Mapping) -> Any:
+        """Subscript nested_map with each key in turn."""
+        for key in path:
+            nested_map = nested_map[key]
+        return nested_map
+
+    return lookup
+
+
+def compile_path(path: Sequence,
+                 default: Any = _MISSING) -> Callable[[Mapping], Any]:
+    """Precompile a key path into a getter.
+    The getter returns what ``access_nested_map(nested_map, path)`` would,
+    but subscripts straight through the path, only falling back to the
+    checked walk when a lookup fails.
+    Parameters
+    ----------
+    path: Sequence
+        a sequence of key representing a path to the value
+    default: Any
+        returned instead of raising KeyError when the path is missing
+    Example
+    -------
+    >>> license_key = compile_path(("license", "key"), default=None)
+    >>> license_key({"license": {"key": "mit"}})
+    'mit'
+    >>> license_key({"license": None}) is None
+    True
+    """
+    path = tuple(path)
+    if all(isinstance(key, str) for key in path):
+        # Subscripting a str, list or number with a str key raises
+        # TypeError, so the chain can't silently index a non-mapping.
+        lookup = _chain_lookup(path)
+    else:
+        def lookup(nested_map: Mapping) -> Any:
+            """Walk nested_map with the checked access_nested_map."""
+            return access_nested_map(nested_map, path)
+
+    def getter(nested_map: Mapping) -> Any:
+        """Return the value at path, or default when it is missing."""
+        try:
+            return lookup(nested_map)
+        except (KeyError, TypeError, IndexError):
+            if default is _MISSING:
+                # Re-walk to raise the same KeyError access_nested_map does
+                return access_nested_map(nested_map, path)
+            return default
+
+    return getter
+
+
+def extract_many(records: Iterable[Mapping], path: Sequence,
+                 default: Any = _MISSING) -> List[Any]:
+    """Extract the value at path from every record.
+    Example
+    -------
+    >>> extract_many([{"a": {"b": 1}}, {"a": {"b": 2}}], ("a", "b"))
+    [1, 2]
+    """
+    return list(map(compile_path(path, default), records))
+
+
+def get_session() -> requests.Session:
+    """Return the calling thread's HTTP session.
+    Sessions are per thread, since ``requests.Session`` is not documented
+    as thread-safe, but they all mount the same ``HTTPAdapter``, so
+    keep-alive connections (and their TLS handshakes) are reused across
+    threads. Failed GETs are retried with backoff on 5xx; 429 and
+    exhausted 403 responses are left to the shared HostRateLimiter.
+    """
+    session = getattr(_local, "session", None)
+    if session is None or _local.version != _mounts_version:
+        session = requests.Session()
+        session.mount("https://", _adapter)
+        session.mount("http://", _adapter)
+        for prefix, adapter in list(_mounts.items()):
+            session.mount(prefix, adapter)
+        _local.session = session
+        _local.version = _mounts_version
+    return session
+
+
+def mount_adapter(prefix: str, adapter: requests.adapters.BaseAdapter) -> None:
+    """Send requests for URLs starting with prefix through adapter.
+    Applies to every thread: each session is rebuilt on its next use.
+    Example
+    -------
+    >>> mount_adapter("https://api.github.com/", ReplayAdapter(...))
+    """
+    global _mounts_version
+    with _mounts_lock:
+        _mounts[prefix] = adapter
+        _mounts_version += 1
+
+
+def unmount_adapter(prefix: str) -> None:
+    """Undo mount_adapter for prefix."""
+    global _mounts_version
+    with _mounts_lock:
+        _mounts.pop(prefix, None)
+        _mounts_version += 1
+
+
+class HostRateLimiter:
+    """Hold back requests to hosts that reported their rate limit spent.
+    A response with ``X-RateLimit-Remaining: 0`` blocks its host until
+    ``X-RateLimit-Reset``; a 403 or 429 with ``Retry-After`` blocks it for
+    that long. A 429 with neither blocks it for ``backoff`` seconds,
+    doubling with each 429 in a row up to ``max_backoff``, with jitter so
+    clients don't all come back at once. Every thread requesting the
+    host then waits in ``wait`` instead of burning requests that would
+    be rejected.
+    """
+
+    def __init__(self, clock: Callable = time.time,
+                 sleep: Callable = time.sleep, backoff: float = 0.5,
+                 max_backoff: float = 30.0,
+                 jitter: Callable = random.random):
+        """Init with injectable clock, sleep and jitter functions."""
+        self._clock = clock
+        self._sleep = sleep
+        self._jitter = jitter
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._blocked_until = {}
+        self._throttled = {}  # host -> 429s in a row without a hint
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        """Sleep until requests to the host of url may resume."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            until = self._blocked_until.get(host, 0)
+        delay = until - self._clock()
+        if delay > 0:
+            self._sleep(delay)
+
+    def update(self, url: str, response: requests.Response) -> bool:
+        """Record the rate-limit headers of response.
+        Returns True if the request was rejected and should be retried.
+        """
+        headers = response.headers
+        host = urlsplit(url).netloc
+        now = self._clock()
+        until = None
+        rejected = response.status_code in (403, 429)
+        retry_after = headers.get("Retry-After") if rejected else None
+        if retry_after:
+            until = now + _retry_after_seconds(retry_after, now)
+        elif headers.get("X-RateLimit-Remaining") == "0":
+            try:
+                until = float(headers.get("X-RateLimit-Reset"))
+            except (TypeError, ValueError):
+                until = None
+        if until is None and response.status_code == 429:
+            with self._lock:
+                strikes = self._throttled.get(host, 0)
+                self._throttled[host] = strikes + 1
+            delay = min(self.max_backoff, self.backoff * 2 ** strikes)
+            until = now + delay * (0.5 + self._jitter() / 2)
+        elif response.status_code != 429:
+            with self._lock:
+                self._throttled.pop(host, None)
+        if until is None:
+            return False
+        with self._lock:
+            self._blocked_until[host] = max(
+                until, self._blocked_until.get(host, 0)
+            )
+        return rejected
+
+
+def _retry_after_seconds(value: str, now: float) -> float:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - now)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+_rate_limiter = HostRateLimiter()
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with an optional ttl (seconds).
+    Example
+    -------
+    >>> cache = LRUCache(maxsize=2)
+    >>> cache.set("a", 1)
+    >>> cache.get("a")
+    1
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = None) -> None:
+        """Init an empty cache holding at most maxsize entries."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the value for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires is not None and time.monotonic() >= expires:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store value, evicting the least recently used entry if full."""
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Remove key if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache:
+    """LRU cache of JSON values in an SQLite file.
+    Same interface as LRUCache, but every process opening the same path
+    sees the same entries, so worker processes can share fetched
+    payloads. Values must be JSON serialisable.
+    """
+
+    def __init__(self, path: str, maxsize: int = 1024,
+                 ttl: float = None) -> None:
+        """Open (creating if needed) the cache database at path."""
+        self.path = os.path.expanduser(path)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires REAL, used REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS cache_used ON cache (used)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread connection; sqlite3 connections can't be shared."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the value for key, or default if missing or expired."""
+        now = time.time()
+        with self._connection() as db:
+            row = db.execute(
+                "SELECT value, expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return default
+            if row[1] is not None and now >= row[1]:
+                db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return default
+            db.execute("UPDATE cache SET used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """Store value, evicting least recently used entries if full."""
+        now = time.time()
+        expires = None if self.ttl is None else now + self.ttl
+        with self._connection() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires, used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires, now),
+            )
+            db.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                "ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+
+    def delete(self, key: str) -> None:
+        """Remove key if present."""
+        with self._connection() as db:
+            db.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._connection() as db:
+            db.execute("DELETE FROM cache")
+
+
+class HTTPCache:
+    """On-disk cache of JSON responses for conditional requests.
+    Each entry keeps the parsed body with the ``ETag`` and
+    ``Last-Modified`` headers it was served with, so the next request for
+    the URL can be revalidated and a ``304 Not Modified`` answered from
+    disk. Once the entries take up more than ``max_bytes`` the least
+    recently used ones are evicted.
+    Several processes may share a directory. Each keeps an index of the
+    entries in memory and rereads the directory at most every
+    ``rescan_interval`` seconds, so between rescans the directory can go
+    over ``max_bytes`` by what the other processes wrote.
+    Example
+    -------
+    >>> set_http_cache(HTTPCache("~/.cache/github"))
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024,
+                 rescan_interval: float = 60.0):
+        """Create the cache directory if needed."""
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.rescan_interval = rescan_interval
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        # path -> size, least recently used first; kept in step by put,
+        # touch and eviction between rescans of the directory
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._scan()
+
+    def _scan(self) -> None:
+        """Rebuild the index from the entries on disk."""
+        found = []
+        for dir_entry in os.scandir(self.directory):
+            if not dir_entry.name.endswith(".json"):
+                continue
+            try:
+                stat = dir_entry.stat()
+            except OSError:  # Evicted by another process meanwhile
+                continue
+            found.append((stat.st_mtime, dir_entry.path, stat.st_size))
+        self._entries = OrderedDict(
+            (path, size) for _, path, size in sorted(found)
+        )
+        self._total = sum(self._entries.values())
+        self._next_scan = time.monotonic() + self.rescan_interval
+
+    def _path(self, url: str) -> str:
+        """File holding the entry for url."""
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name + ".json")
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Return the cached entry for url, or None."""
+        try:
+            with open(self._path(url), encoding="utf-8") as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def touch(self, url: str) -> None:
+        """Mark the entry for url as recently used."""
+        path = self._path(url)
+        try:
+            os.utime(path)
+        except OSError:
+            return
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+
+    def put(self, url: str, body: Any, etag: Optional[str] = None,
+            last_modified: Optional[str] = None,
+            next_url: Optional[str] = None) -> None:
+        """Store body with its validators, then evict if over budget."""
+        entry = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "next": next_url,
+            "body": body,
+        }
+        path = self._path(url)
+        tmp_path = "{}.{}.{}.tmp".format(
+            path, os.getpid(), threading.get_ident()
+        )
+        with open(tmp_path, "w", encoding="utf-8") as entry_file:
+            json.dump(entry, entry_file)
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            os.replace(tmp_path, path)  # Readers never see a partial entry
+            self._total += size - self._entries.pop(path, 0)
+            self._entries[path] = size
+            self._evict()
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, name))
+            self._entries.clear()
+            self._total = 0
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until under max_bytes.
+        Called with the lock held.
+        """
+        if time.monotonic() >= self._next_scan:
+            self._scan()  # Pick up what other processes wrote
+        while self._total > self.max_bytes and self._entries:
+            path, size = self._entries.popitem(last=False)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._total -= size
+
+
+def set_http_cache(cache: Optional[HTTPCache]) -> None:
+    """Use cache for get_json revalidation; None turns caching off."""
+    global _http_cache
+    _http_cache = cache
+
+
+def _get(url: str, headers: Dict, stream: bool = False) -> requests.Response:
+    """GET url with the shared session, waiting out host rate limits."""
+    kwargs = {"timeout": TIMEOUT}
+    if headers:
+        kwargs["headers"] = headers
+    if stream:
+        kwargs["stream"] = True
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        _rate_limiter.wait(url)
+        response = get_session().get(url, **kwargs)
+        retry = _rate_limiter.update(url, response)
+        if not retry or attempt == RATE_LIMIT_RETRIES:
+            return response
+        response.close()  # Hand the connection back before retrying
+
+
+def _fetch(url: str) -> Tuple[Any, Optional[str]]:
+    """GET url as JSON, revalidating against the HTTP cache if installed.
+    Returns the payload and the ``rel="next"`` URL of its Link header.
+    """
+    cache = _http_cache
+    entry = cache.get(url) if cache is not None else None
+    headers = {}
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = _get(url, headers)
+    if entry is not None and response.status_code == 304:
+        cache.touch(url)
+        return entry["body"], entry.get("next")
+
+    payload = response.json()
+    next_url = response.links.get("next", {}).get("url")
+    if cache is not None and response.ok:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            cache.put(url, payload, etag, last_modified, next_url)
+    return payload, next_url
+
+
+def _fetch_projected(url: str,
+                     paths: Sequence[Sequence]) -> Tuple[List, Optional[str]]:
+    """GET a JSON array from url, parsing it as it streams in.
+    Returns the elements projected to paths and the ``rel="next"`` URL.
+    Bypasses the HTTP cache, which stores whole bodies.
+    """
+    response = _get(url, {}, stream=True)
+    with response:
+        items = list(iter_json_array(
+            response.iter_content(CHUNK_SIZE), paths
+        ))
+        return items, response.links.get("next", {}).get("url")
+
+
+def get_json(url: str,
+             paths: Optional[Sequence[Sequence]] = None) -> Union[Dict, List]:
     """Get JSON from remote URL.
+    With an HTTPCache installed, a cached response is revalidated with
+    ``If-None-Match`` / ``If-Modified-Since`` and reused on a 304.
+    With paths, the response must be a JSON array; it is parsed as it
+    streams in and each element is reduced to those paths (see project).
+    """
+    if paths is not None:
+        items, _ = _fetch_projected(url, paths)
+        return items
+    payload, _ = _fetch(url)
+    return payload
+
+
+def iter_json_pages(url: str, params: Optional[Dict] = None,
+                    paths: Optional[Sequence[Sequence]] = None) -> Iterator:
+    """Yield each page of a paginated JSON resource.
+    Pages are fetched one at a time, following the ``rel="next"`` link
+    of each response, so a consumer can work on the first page before
+    the last one is requested. paths works as in get_json.
+    Example
+    -------
+    >>> for page in iter_json_pages(repos_url, {"per_page": 100}):
+    ...     names.extend(repo["name"] for repo in page)
+    """
+    if params:
+        separator = "&" if "?" in url else "?"
+        url = url + separator + urlencode(params)
+    while url:
+        if paths is not None:
+            payload, url = _fetch_projected(url, paths)
+        else:
+            payload, url = _fetch(url)
+        yield payload
+
+
+def project(record: Any, paths: Sequence[Sequence]) -> Dict:
+    """Copy only the values at paths out of record, keeping the nesting.
+    Paths missing from record are left out.
+    Example
+    -------
+    >>> project({"name": "x", "license": {"key": "mit", "url": "..."}},
+    ...         [("name",), ("license", "key")])
+    {'name': 'x', 'license': {'key': 'mit'}}
     """
-    response = requests.get(url)
-    return response.json()
+    return _projector(paths)(record)
 
 
-def memoize(fn: Callable) -> Callable:
+def _projector(paths: Sequence[Sequence]) -> Callable[[Any], Dict]:
+    """Compile paths once into a projection function."""
+    getters = [
+        (tuple(path), compile_path(path)) for path in paths
+    ]
+
+    def projection(record: Any) -> Dict:
+        """Copy the values at paths out of record."""
+        result = {}
+        for path, getter in getters:
+            try:
+                value = getter(record)
+            except KeyError:
+                continue
+            node = result
+            for key in path[:-1]:
+                node = node.setdefault(key, {})
+            node[path[-1]] = value
+        return result
+
+    return projection
+
+
+def iter_json_array(chunks: Iterable[bytes],
+                    paths: Optional[Sequence[Sequence]] = None) -> Iterator:
+    """Parse a top-level JSON array incrementally from UTF-8 chunks.
+    Elements are yielded as soon as they are complete, so only one
+    element (plus the unparsed tail of the input) is held at a time.
+    With paths, each element is reduced with project before it is
+    yielded and the rest of it is dropped straight away.
+    Example
+    -------
+    >>> list(iter_json_array([b'[{"a": 1, "b": 2}, {"a"', b': 3}]'],
+    ...                      [("a",)]))
+    [{'a': 1}, {'a': 3}]
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    projection = _projector(paths) if paths is not None else None
+    buffer = ""
+    pos = 0
+    expecting = "["  # then "value" or "]", then "," or "]"
+    chunks = iter(chunks)
+    final = False
+
+    while True:
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            chunk, final = b"", True
+        buffer = buffer[pos:] + text.decode(chunk, final)
+        pos = 0
+
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            char = buffer[pos]
+            if expecting == "[":
+                if char != "[":
+                    raise ValueError("expected a JSON array")
+                pos += 1
+                expecting = "first"
+            elif expecting in ("first", ",") and char == "]":
+                # Anything after the closing bracket must be blank
+                rest = buffer[pos + 1:] + "".join(
+                    text.decode(c) for c in chunks
+                ) + text.decode(b"", True)
+                if rest.strip():
+                    raise ValueError("extra data after JSON array")
+                return
+            elif expecting == ",":
+                if char != ",":
+                    raise ValueError("expected ',' or ']' in JSON array")
+                pos += 1
+                expecting = "value"
+            else:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break  # Element not complete yet
+                # raw_decode takes the longest number it can see, so "1."
+                # or "1e" is read as 1; it is only complete once a comma,
+                # bracket or whitespace follows it
+                if type(value) in (int, float) and not final and (
+                    end == len(buffer) or buffer[end] in _NUMBER_CHARS
+                ):
+                    break  # The number could continue in the next chunk
+                pos = end
+                expecting = ","
+                yield projection(value) if projection else value
+
+        if final:
+            raise ValueError("truncated JSON array")
+
+
+class _InstanceLock:
+    """Lock kept in an instance's ``__dict__`` by memoize.
+    Pickling or copying the instance gives the copy a new, unlocked lock,
+    where a bare ``threading.Lock`` could not be pickled at all.
+    """
+
+    def __init__(self) -> None:
+        """Init with a fresh lock."""
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> bool:
+        """Acquire the lock."""
+        return self._lock.__enter__()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Release the lock."""
+        self._lock.__exit__(*exc_info)
+
+    def __reduce__(self) -> Tuple:
+        """Pickle and copy as a new lock."""
+        return (_InstanceLock, ())
+
+
+class MemoizedProperty(property):
+    """Property created by memoize, with a way to drop the cached value.
+    Example
+    -------
+    >>> MyClass.a_method.invalidate(my_object)
+    """
+
+    def __init__(self, fget: Callable, attr_name: str) -> None:
+        """Init with the getter and the attribute holding the value."""
+        super().__init__(fget, doc=fget.__doc__)
+        self.attr_name = attr_name
+
+    def invalidate(self, obj: Any) -> None:
+        """Forget obj's cached value so the next access recomputes it."""
+        for suffix in ("", "_expires", "_task"):
+            obj.__dict__.pop(self.attr_name + suffix, None)
+
+
+def memoize(fn: Callable = None, *, ttl: float = None) -> Callable:
     """Decorator to memoize a method.
+    The value is computed once per instance and stored in ``_<name>``.
+    With ``ttl`` (seconds) it is recomputed on the first access after it
+    expires. Concurrent first accesses from several threads compute it
+    only once: the others wait on a per-instance lock. Coroutine methods
+    share one task while it runs, so ``await obj.a_method`` runs once,
+    and then cache its result, which any later event loop can await.
     Example
     -------
     class MyClass:
@@ -56,20 +824,79 @@ def memoize(fn: Callable) -> Callable:
         def a_method(self):
             print("a_method called")
             return 42
+
+        @memoize(ttl=60)
+        def a_fresh_method(self):
+            return time.time()
     >>> my_object = MyClass()
     >>> my_object.a_method
     a_method called
     42
     >>> my_object.a_method
     42
+    >>> MyClass.a_method.invalidate(my_object)
+    >>> my_object.a_method
+    a_method called
+    42
     """
+    if fn is None:
+        return lambda fn: memoize(fn, ttl=ttl)
+
     attr_name = "_{}".format(fn.__name__)
+    expires_name = attr_name + "_expires"
+    task_name = attr_name + "_task"
+    lock_name = attr_name + "_lock"
+
+    def is_fresh(self: Any) -> bool:
+        """Whether self holds a cached value that has not expired."""
+        if attr_name not in self.__dict__:
+            return False
+        if ttl is None:
+            return True
+        return time.monotonic() < self.__dict__.get(expires_name, 0)
+
+    def store(self: Any, value: Any) -> None:
+        """Cache value on self, with its expiry when ttl is set."""
+        setattr(self, attr_name, value)
+        if ttl is not None:
+            setattr(self, expires_name, time.monotonic() + ttl)
+
+    if inspect.iscoroutinefunction(fn):
+        def finish(self: Any, task: asyncio.Task) -> None:
+            """Cache the result of task, unless it failed or is stale."""
+            if self.__dict__.get(task_name) is not task:
+                return  # Invalidated while running
+            del self.__dict__[task_name]
+            if not task.cancelled() and task.exception() is None:
+                store(self, task.result())
 
-    @wraps(fn)
-    def memoized(self):
-        """"memoized wraps"""
-        if not hasattr(self, attr_name):
-            setattr(self, attr_name, fn(self))
-        return getattr(self, attr_name)
+        @wraps(fn)
+        def memoized(self):
+            """"memoized wraps"""
+            loop = asyncio.get_running_loop()
+            if is_fresh(self):
+                future = loop.create_future()
+                future.set_result(getattr(self, attr_name))
+                return future
+            # A task belongs to the loop it was started on; one left
+            # running on another loop is not awaited here
+            task = self.__dict__.get(task_name)
+            if task is None or task.get_loop() is not loop:
+                task = loop.create_task(fn(self))
+                self.__dict__[task_name] = task
+                task.add_done_callback(lambda done: finish(self, done))
+            return task
+    else:
+        @wraps(fn)
+        def memoized(self):
+            """"memoized wraps"""
+            if is_fresh(self):
+                return getattr(self, attr_name)
+            # setdefault is atomic, so racing threads get the same lock
+            lock = self.__dict__.setdefault(lock_name, _InstanceLock())
+            with lock:
+                if not is_fresh(self):
+                    store(self, fn(self))
+                return getattr(self, attr_name)
 
-    return property(memoized)
+    return MemoizedProperty(memoized, attr_name)
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose entries live in one process only
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+}
+
+
+@register(Tags.caches, deploy=True)
+def membership_cache_is_shared(app_configs, **kwargs):
+    # chats.membership authorizes requests from the cache; with a cache per
+    # process, invalidation only reaches the worker that made the change
+    backend = settings.CACHES['default']['BACKEND']
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f"The default cache ({backend}) is not shared between processes.",
+            hint="Set CACHE_URL to a shared cache such as Redis; chats.membership "
+                 "relies on invalidations reaching every worker.",
+            id='chats.E001',
+        )]
+    return []
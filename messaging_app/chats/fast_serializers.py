@@ -0,0 +1,194 @@
+"""
+Read-only fast paths for the chats serializers.
+
+Plain functions that build exactly the data UserSerializer, MessageSerializer,
+ConversationSerializer and ConversationListSerializer would, without DRF's
+per-field machinery. They are used by the list and retrieve actions; writes
+still go through the DRF serializers and their validation. Any field added to
+those serializers must be added here too (chats.tests checks they agree).
+
+Every function takes an optional chats.fieldsets.FieldSelection and then
+returns the same sparse shape SparseFieldsMixin gives the DRF serializers.
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .fieldsets import FULL
+
+USER_FIELDS = ('user_id', 'first_name', 'last_name', 'email', 'phone_number', 'role', 'created_at')
+MESSAGE_FIELDS = ('message_id', 'sender', 'message_body', 'sent_at')
+CONVERSATION_FIELDS = ('conversation_id', 'participants', 'created_at', 'messages')
+CONVERSATION_SUMMARY_FIELDS = (
+    'conversation_id', 'participants', 'created_at', 'message_count', 'last_message_at', 'latest_messages',
+)
+
+_datetime_field = serializers.DateTimeField()
+
+
+def format_datetime(value):
+    # Same output as serializers.DateTimeField().to_representation(value)
+    if (value is None or not settings.USE_TZ or timezone.is_naive(value)
+            or api_settings.DATETIME_FORMAT is None or api_settings.DATETIME_FORMAT.lower() != ISO_8601):
+        return _datetime_field.to_representation(value)
+    value = value.astimezone(timezone.get_current_timezone()).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _uuid(value):
+    return None if value is None else str(value)
+
+
+def _str(value):
+    return None if value is None else str(value)
+
+
+def _same(value):
+    return value
+
+
+# How each plain column is rendered, by field name
+FORMATTERS = {
+    'user_id': _uuid,
+    'first_name': _same,
+    'last_name': _same,
+    'email': _same,
+    'phone_number': _same,
+    'role': _str,
+    'created_at': format_datetime,
+    'message_id': _uuid,
+    'message_body': _str,
+    'sent_at': format_datetime,
+    'conversation_id': _uuid,
+    'message_count': _same,
+    'last_message_at': format_datetime,
+}
+
+
+def _ids(objects):
+    return [str(obj.pk) for obj in objects]
+
+
+def user_data(user, selection=FULL):
+    if not selection.is_full:
+        return {name: FORMATTERS[name](getattr(user, name)) for name in selection.select(USER_FIELDS)}
+    # Spelled out for the common case; a dict literal beats the loop above
+    return {
+        'user_id': _uuid(user.user_id),
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'email': user.email,
+        'phone_number': user.phone_number,
+        'role': _str(user.role),
+        'created_at': format_datetime(user.created_at),
+    }
+
+
+def message_data(message, selection=FULL):
+    if selection.is_full:
+        return {
+            'message_id': _uuid(message.message_id),
+            'sender': user_data(message.sender),
+            'message_body': _str(message.message_body),
+            'sent_at': format_datetime(message.sent_at),
+        }
+    data = {}
+    for name in selection.select(MESSAGE_FIELDS):
+        if name != 'sender':
+            data[name] = FORMATTERS[name](getattr(message, name))
+        elif selection.is_expanded(name):
+            data[name] = user_data(message.sender, selection.child(name))
+        else:
+            data[name] = _uuid(message.sender_id)
+    return data
+
+
+def message_values(queryset, selection=FULL):
+    """
+    Turn a Message queryset into .values() rows for message_row_data.
+
+    Only the columns the selection needs are fetched (plus message_id and
+    sent_at, which pagination uses), and users are only joined when the
+    sender is expanded.
+    """
+    columns = ['message_id', 'sent_at']
+    if selection.includes('message_body'):
+        columns.append('message_body')
+    if selection.includes('sender'):
+        if selection.is_expanded('sender'):
+            columns += [f'sender__{name}' for name in selection.child('sender').select(USER_FIELDS)]
+        else:
+            columns.append('sender_id')
+    return queryset.values(*columns)
+
+
+def message_row_data(row, selection=FULL):
+    # A row from message_values(): no model instances are built at all
+    if not selection.is_full:
+        data = {}
+        for name in selection.select(MESSAGE_FIELDS):
+            if name != 'sender':
+                data[name] = FORMATTERS[name](row[name])
+            elif selection.is_expanded(name):
+                data[name] = {
+                    field: FORMATTERS[field](row[f'sender__{field}'])
+                    for field in selection.child(name).select(USER_FIELDS)
+                }
+            else:
+                data[name] = _uuid(row['sender_id'])
+        return data
+    return {
+        'message_id': _uuid(row['message_id']),
+        'sender': {
+            'user_id': _uuid(row['sender__user_id']),
+            'first_name': row['sender__first_name'],
+            'last_name': row['sender__last_name'],
+            'email': row['sender__email'],
+            'phone_number': row['sender__phone_number'],
+            'role': _str(row['sender__role']),
+            'created_at': format_datetime(row['sender__created_at']),
+        },
+        'message_body': _str(row['message_body']),
+        'sent_at': format_datetime(row['sent_at']),
+    }
+
+
+def _conversation(conversation, names, selection, related):
+    # related: relation name -> callable returning the related objects
+    data = {}
+    for name in selection.select(names):
+        if name == 'participants' or name in related:
+            objects = related[name]() if name in related else conversation.participants.all()
+            if not selection.is_expanded(name):
+                data[name] = _ids(objects)
+            elif name == 'participants':
+                child = selection.child(name)
+                data[name] = [user_data(user, child) for user in objects]
+            else:
+                child = selection.child(name)
+                data[name] = [message_data(message, child) for message in objects]
+        else:
+            data[name] = FORMATTERS[name](getattr(conversation, name))
+    return data
+
+
+def conversation_data(conversation, selection=FULL):
+    # Mirrors ConversationSerializer; expects the prefetches of
+    # ConversationViewSet.get_queryset (messages in sent_at order)
+    def messages():
+        if 'messages' in getattr(conversation, '_prefetched_objects_cache', {}):
+            return conversation.messages.all()
+        return conversation.messages.select_related('sender').order_by('sent_at')
+
+    return _conversation(conversation, CONVERSATION_FIELDS, selection, {'messages': messages})
+
+
+def conversation_summary_data(conversation, selection=FULL):
+    # Mirrors ConversationListSerializer
+    return _conversation(
+        conversation, CONVERSATION_SUMMARY_FIELDS, selection,
+        {'latest_messages': lambda: conversation.latest_messages},
+    )
@@ -0,0 +1,80 @@
+"""
+Sparse fieldsets for the chats API: ?fields=, ?omit= and ?expand=.
+
+    ?fields=message_id,sent_at           only these fields
+    ?fields=message_id,sender.email      dotted names select nested fields
+    ?omit=sender.phone_number            drop fields (dotted for nested ones)
+    ?expand=sender                       with ?fields, render the related object
+
+Without ?fields every field is returned, with related objects nested as
+before (minus anything in ?omit). Once ?fields is given, relations that are
+selected but neither expanded nor given dotted subfields collapse to their
+id (or a list of ids), which also lets the views skip the join or prefetch.
+Unknown names are ignored.
+"""
+
+
+class FieldSelection:
+    """The fields requested for one serializer, with nested selections."""
+
+    def __init__(self, fields=None, omit=None, expand=None):
+        self.fields = fields  # None for all, else {name: subfield names or None}
+        self.omit = omit or {}  # {name: nested names, or None to drop the field}
+        self.expand = expand or {}  # {name: nested names}
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        fields = params.get('fields')
+        return cls(
+            fields=_parse(fields) if fields is not None else None,
+            omit=_parse(params.get('omit', '')),
+            expand=_parse(params.get('expand', '')),
+        )
+
+    @property
+    def is_full(self):
+        return self.fields is None and not self.omit
+
+    def includes(self, name):
+        if self.omit.get(name, ()) is None:
+            return False
+        return self.fields is None or name in self.fields
+
+    def is_expanded(self, name):
+        if self.fields is None or name in self.expand:
+            return True
+        return self.fields.get(name) is not None  # Dotted subfields were given
+
+    def child(self, name):
+        # The selection to apply inside the related object `name`
+        subfields = self.fields.get(name) if self.fields is not None else None
+        return FieldSelection(
+            fields=_parse(','.join(subfields)) if subfields is not None else None,
+            omit=_parse(','.join(self.omit.get(name) or ())),
+            expand=_parse(','.join(self.expand.get(name) or ())),
+        )
+
+    def select(self, names):
+        """Return the names in `names` that are included, in that order."""
+        return [name for name in names if self.includes(name)]
+
+
+FULL = FieldSelection()
+
+
+def _parse(value):
+    # "a,b.c,b.d" -> {'a': None, 'b': ['c', 'd']}
+    parsed = {}
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, rest = item.partition('.')
+        if rest:
+            subfields = parsed.get(name) or []
+            subfields.append(rest)
+            parsed[name] = subfields
+        else:
+            parsed.setdefault(name, None)
+    return parsed
@@ -1,4 +1,11 @@
+import operator
+from functools import reduce
+
 import django_filters
+from django.db.models import Q
+from rest_framework import filters
+
+from . import search
 from .models import Message
 
 class MessageFilter(django_filters.FilterSet):
@@ -24,3 +31,36 @@ class MessageFilter(django_filters.FilterSet):
         Filter queryset to messages whose conversation participants include user with given user_id.
         """
         return queryset.filter(conversation__participants__user_id=value)
+
+
+class MessageSearchFilter(filters.SearchFilter):
+    """
+    DRF's SearchFilter, except that `message_body` is matched through the
+    full-text index (see chats.search) instead of LIKE '%term%', which has to
+    read every message body. Other search_fields keep DRF's lookups, and as
+    before every term must match at least one field.
+    """
+
+    full_text_field = 'message_body'
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        if not search_fields or not search_terms:
+            return queryset
+
+        other_fields = [str(field) for field in search_fields if field != self.full_text_field]
+        lookups = [self.construct_search(field, queryset) for field in other_fields]
+        for term in search_terms:
+            conditions = [Q(**{lookup: term}) for lookup in lookups]
+            if self.full_text_field in search_fields:
+                match = search.body_matches(term)
+                if match is not None:
+                    conditions.append(Q(match))
+            if not conditions:
+                return queryset.none()
+            queryset = queryset.filter(reduce(operator.or_, conditions))
+
+        if self.must_call_distinct(queryset, other_fields):
+            queryset = queryset.distinct()
+        return queryset
@@ -0,0 +1,109 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from chats import fast_serializers
+from chats.models import Conversation, Message, User
+from chats.serializers import MessageSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare MessageSerializer with the fast read path on N messages: "
+        "throughput and per-page latency. Test rows are created in a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=10000)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['messages'], options['page_size'], options['rounds'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, count, page_size, rounds):
+        if count < 1 or page_size < 1 or rounds < 1:
+            raise CommandError("--messages, --page-size and --rounds must be positive")
+        senders = [
+            User.objects.create_user(
+                username=f"bench{n}", email=f"bench{n}@example.com", password=None,
+                first_name="Bench", last_name=str(n),
+            )
+            for n in range(10)
+        ]
+        conversation = Conversation.objects.create()
+        conversation.participants.set(senders)
+        Message.objects.bulk_create(
+            [Message(sender=senders[n % len(senders)], conversation=conversation, message_body=f"message {n}")
+             for n in range(count)],
+            batch_size=500,
+        )
+        queryset = Message.objects.filter(conversation=conversation).order_by('sent_at', 'message_id')
+
+        # What each path does for a list page: fetch and serialize. Pages are
+        # picked by primary key so that OFFSET scans don't swamp the numbers.
+        ids = list(queryset.values_list('message_id', flat=True))
+
+        def page_of(offset):
+            return queryset.filter(message_id__in=ids[offset:offset + page_size])
+
+        def drf(offset):
+            return MessageSerializer(page_of(offset).select_related('sender'), many=True).data
+
+        def fast_instances(offset):
+            return [fast_serializers.message_data(message) for message in page_of(offset).select_related('sender')]
+
+        def fast_values(offset):
+            return [fast_serializers.message_row_data(row) for row in fast_serializers.message_values(page_of(offset))]
+
+        # Serializing only, on rows already in memory
+        messages = list(queryset.select_related('sender'))
+        rows = list(fast_serializers.message_values(queryset))
+        if MessageSerializer(messages, many=True).data != [fast_serializers.message_row_data(r) for r in rows]:
+            raise CommandError("fast serializers disagree with MessageSerializer")
+
+        def drf_only(offset):
+            return MessageSerializer(messages[offset:offset + page_size], many=True).data
+
+        def fast_only(offset):
+            return [fast_serializers.message_row_data(row) for row in rows[offset:offset + page_size]]
+
+        self.stdout.write(f"{count} messages, pages of {page_size}, {rounds} rounds")
+        for name, page in [
+            ("serialize: MessageSerializer", drf_only),
+            ("serialize: fast_serializers", fast_only),
+            ("query+serialize: MessageSerializer", drf),
+            ("query+serialize: fast, instances", fast_instances),
+            ("query+serialize: fast, .values()", fast_values),
+        ]:
+            self.report(name, self.measure(page, count, page_size, rounds), count * rounds)
+
+    @staticmethod
+    def measure(page, count, page_size, rounds):
+        latencies = []
+        for _ in range(rounds):
+            for offset in range(0, count, page_size):
+                start = time.perf_counter()
+                page(offset)
+                latencies.append(time.perf_counter() - start)
+        return latencies
+
+    def report(self, name, latencies, total):
+        elapsed = sum(latencies)
+        p99 = statistics.quantiles(latencies, n=100)[98] if len(latencies) > 1 else latencies[0]
+        self.stdout.write(
+            f"{name:36} {total / elapsed:12,.0f} msg/s   "
+            f"p50 {statistics.median(latencies) * 1000:7.3f} ms   p99 {p99 * 1000:7.3f} ms per page"
+        )
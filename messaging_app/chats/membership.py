@@ -0,0 +1,42 @@
+from django.core.cache import cache
+
+from .models import ConversationParticipant
+
+# How long a user's conversation-id set is trusted. Changes to membership
+# invalidate it straight away (see chats/signals.py); the timeout only
+# bounds the damage of a change made behind the ORM's back.
+CACHE_TIMEOUT = 300
+
+
+def cache_key(user_id):
+    return f"chats:conversation_ids:{user_id}"
+
+
+def conversation_ids(user, cached=True):
+    """
+    Return the frozenset of conversation ids `user` participates in.
+
+    Read from Django's cache, so hot users skip the participants join;
+    on a miss it is one indexed query on the participants table. Pass
+    cached=False for an authoritative answer, e.g. before a write.
+    """
+    if user is None or user.pk is None:
+        return frozenset()
+    key = cache_key(user.pk)
+    ids = cache.get(key) if cached else None
+    if ids is None:
+        ids = frozenset(
+            ConversationParticipant.objects.filter(user_id=user.pk).values_list('conversation_id', flat=True)
+        )
+        cache.set(key, ids, CACHE_TIMEOUT)
+    return ids
+
+
+def is_participant(user, conversation_id):
+    return conversation_id in conversation_ids(user)
+
+
+def invalidate(user_ids):
+    keys = [cache_key(user_id) for user_id in user_ids]
+    if keys:
+        cache.delete_many(keys)
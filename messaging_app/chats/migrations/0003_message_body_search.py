@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from . import _search_0003 as search
+
+
+def install(apps, schema_editor):
+    search.install(schema_editor)
+
+
+def uninstall(apps, schema_editor):
+    search.uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0002_conversationparticipant'),
+    ]
+
+    operations = [
+        # Full-text index over message_body: FTS5 on SQLite, FULLTEXT on
+        # MySQL, nothing elsewhere (see _search_0003.py)
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,61 @@
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+from . import _search_0003 as search
+
+
+def reinstall_search(apps, schema_editor):
+    # SQLite applies the AlterFields by copying chats_message into a new
+    # table, which drops the full-text triggers and renumbers rowids
+    if schema_editor.connection.vendor == 'sqlite':
+        search.install(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0003_message_body_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search),
+        # Added before the single-column FK indexes go: MySQL needs an index
+        # leading with each foreign key column at all times
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'sent_at'], name='chats_msg_conv_sent'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'sent_at'], name='chats_msg_sender_sent'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='conversation',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='chats.conversation'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='sender',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='messages_sent', to=settings.AUTH_USER_MODEL),
+        ),
+        # Primary keys are indexed already; db_index=True asked for nothing more
+        migrations.AlterField(
+            model_name='conversation',
+            name='conversation_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='message_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='user_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(reinstall_search, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+from . import _search_0003, _search_0005
+
+
+def key_by_message_id(apps, schema_editor):
+    # The 0003 index was keyed by chats_message's implicit rowid, which
+    # VACUUM and table rebuilds may renumber (see _search_0005.py)
+    if schema_editor.connection.vendor == 'sqlite':
+        _search_0003.uninstall(schema_editor)
+        _search_0005.install(schema_editor)
+
+
+def key_by_rowid(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        _search_0005.uninstall(schema_editor)
+        _search_0003.install(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0004_message_indexes'),
+    ]
+
+    operations = [
+        # SQLite only: MySQL's FULLTEXT index lives on chats_message itself
+        migrations.RunPython(key_by_message_id, key_by_rowid),
+    ]
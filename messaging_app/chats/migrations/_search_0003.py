@@ -0,0 +1,60 @@
+# The full-text index as migration 0003 created it, frozen here so the
+# migration history doesn't change when chats/search.py does. Don't edit;
+# a later migration that changes the index gets its own copy.
+#
+# SQLite: an external-content FTS5 table over chats_message, keyed by the
+# table's rowid and kept in sync by triggers, so bulk_create() and
+# queryset.update()/delete() (which send no signals) are indexed too.
+# MySQL: a FULLTEXT index queried with MATCH ... AGAINST.
+
+FTS_TABLE = 'chats_message_fts'
+FULLTEXT_INDEX = 'chats_message_body_ft'
+
+SQLITE_INSTALL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        message_body, content='chats_message', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON chats_message BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, message_body) VALUES (new.rowid, new.message_body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON chats_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message_body) VALUES ('delete', old.rowid, old.message_body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF message_body ON chats_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message_body) VALUES ('delete', old.rowid, old.message_body);
+        INSERT INTO {FTS_TABLE}(rowid, message_body) VALUES (new.rowid, new.message_body);
+    END
+    """,
+    # Index the rows that are already there
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+MYSQL_INSTALL = [f"ALTER TABLE chats_message ADD FULLTEXT INDEX {FULLTEXT_INDEX} (message_body)"]
+MYSQL_UNINSTALL = [f"ALTER TABLE chats_message DROP INDEX {FULLTEXT_INDEX}"]
+
+
+def install(schema_editor):
+    statements = {'sqlite': SQLITE_INSTALL, 'mysql': MYSQL_INSTALL}
+    for sql in statements.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql)
+
+
+def uninstall(schema_editor):
+    statements = {'sqlite': SQLITE_UNINSTALL, 'mysql': MYSQL_UNINSTALL}
+    for sql in statements.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql)
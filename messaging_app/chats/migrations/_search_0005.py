@@ -0,0 +1,92 @@
+# The SQLite full-text index as migration 0005 created it, frozen here so
+# the migration history doesn't change when chats/search.py does. Don't
+# edit; a later migration that changes the index gets its own copy.
+#
+# chats_message's primary key is a UUID, so its implicit rowid is not
+# stable: VACUUM and SQLite's copy-and-rename table rebuilds may renumber
+# it. The FTS5 table is therefore keyed by chats_message_fts_key, which
+# gives every message_id an INTEGER PRIMARY KEY that nothing renumbers.
+# The FTS5 table is contentless (content=''), so bodies aren't stored
+# twice; the triggers pass the old body when removing an entry.
+#
+# A migration that rebuilds chats_message drops these triggers with the old
+# table and must call install_triggers() afterwards. The key table and the
+# index are untouched by the rebuild and stay valid.
+
+FTS_TABLE = 'chats_message_fts'
+KEY_TABLE = 'chats_message_fts_key'
+
+SQLITE_TABLES = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {KEY_TABLE} (
+        id INTEGER PRIMARY KEY,
+        message_id char(32) NOT NULL UNIQUE
+    )
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        message_body, content='',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+]
+
+SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON chats_message BEGIN
+        INSERT INTO {KEY_TABLE}(message_id) VALUES (new.message_id);
+        INSERT INTO {FTS_TABLE}(rowid, message_body) VALUES (last_insert_rowid(), new.message_body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON chats_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message_body)
+            SELECT 'delete', id, old.message_body FROM {KEY_TABLE} WHERE message_id = old.message_id;
+        DELETE FROM {KEY_TABLE} WHERE message_id = old.message_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF message_body ON chats_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message_body)
+            SELECT 'delete', id, old.message_body FROM {KEY_TABLE} WHERE message_id = old.message_id;
+        INSERT INTO {FTS_TABLE}(rowid, message_body)
+            SELECT id, new.message_body FROM {KEY_TABLE} WHERE message_id = new.message_id;
+    END
+    """,
+]
+
+# Index the rows that are already there
+SQLITE_FILL = [
+    f"INSERT INTO {KEY_TABLE}(message_id) SELECT message_id FROM chats_message",
+    f"""
+    INSERT INTO {FTS_TABLE}(rowid, message_body)
+        SELECT {KEY_TABLE}.id, chats_message.message_body
+        FROM chats_message JOIN {KEY_TABLE} ON {KEY_TABLE}.message_id = chats_message.message_id
+    """,
+]
+
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+    f"DROP TABLE IF EXISTS {KEY_TABLE}",
+]
+
+
+def install(schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_TABLES + SQLITE_TRIGGERS + SQLITE_FILL:
+            schema_editor.execute(sql)
+
+
+def install_triggers(schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_TRIGGERS:
+            schema_editor.execute(sql)
+
+
+def uninstall(schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_UNINSTALL:
+            schema_editor.execute(sql)
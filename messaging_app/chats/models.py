@@ -5,7 +5,7 @@ from django.utils import timezone
 
 class User(AbstractUser):
     # Override the default id with UUID
-    user_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, db_index=True)
+    user_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
     # Use AbstractUser's first_name and last_name fields (non-null enforced via blank=False)
     first_name = models.CharField(max_length=150, blank=False)
@@ -49,24 +49,59 @@ class User(AbstractUser):
 
 
 class Conversation(models.Model):
-    conversation_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, db_index=True)
+    conversation_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
-    participants = models.ManyToManyField(User, related_name='conversations')
+    participants = models.ManyToManyField(User, related_name='conversations', through='ConversationParticipant')
     created_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return f"Conversation {self.conversation_id}"
 
+    def has_participant(self, user):
+        return ConversationParticipant.is_member(self.conversation_id, user)
+
+
+class ConversationParticipant(models.Model):
+    # Explicit through model for Conversation.participants. It maps onto the
+    # table Django created for the plain M2M, so existing rows are kept.
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = 'chats_conversation_participants'
+        unique_together = [('conversation', 'user')]
+        indexes = [
+            # "Which conversations is this user in?" and user-first membership checks
+            models.Index(fields=['user', 'conversation'], name='chats_participant_user_conv'),
+        ]
+
+    @classmethod
+    def is_member(cls, conversation_id, user):
+        # One indexed EXISTS lookup; never loads the participant list
+        if user is None or user.pk is None:
+            return False
+        return cls.objects.filter(conversation_id=conversation_id, user_id=user.pk).exists()
+
 
 class Message(models.Model):
-    message_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, db_index=True)
+    message_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
-    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='messages_sent')
-    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
+    # Both are indexed by the composite indexes below, which lead with them
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='messages_sent', db_index=False)
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages', db_index=False)
 
     message_body = models.TextField(blank=False)
     sent_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # A conversation's messages in time order: the message list and its
+            # cursor pages, the list view's latest messages and last_message_at
+            models.Index(fields=['conversation', 'sent_at'], name='chats_msg_conv_sent'),
+            # A user's sent messages in time order
+            models.Index(fields=['sender', 'sent_at'], name='chats_msg_sender_sent'),
+        ]
+
     def __str__(self):
         return f"Message {self.message_id} from {self.sender.email} at {self.sent_at}"
 
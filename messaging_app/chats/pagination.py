@@ -1,15 +1,143 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+import uuid
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
 
-class MessagePagination(PageNumberPagination):
+class MessageCursorPagination(BasePagination):
+    """
+    Keyset pagination over messages for infinite scroll.
+
+    Pages are cut at a (sent_at, message_id) position instead of an OFFSET,
+    so every page costs the same index range scan however deep it is, and
+    messages inserted while a client scrolls never shift or repeat rows.
+    The cursor is an opaque base64 token. No COUNT(*) is run unless the
+    client asks for one with ?count=1, and even then it stops at count_limit.
+    Newest messages come first; ?ordering=sent_at scrolls oldest first.
+    """
     page_size = 20
-    page_size_query_param = 'page_size'  # Optional: allow client to override page size
+    page_size_query_param = 'page_size'
     max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_limit = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.descending = request.query_params.get('ordering') != 'sent_at'
+        position, reverse = self.decode_cursor(request)
+
+        # Walking backwards (a "previous" cursor) scans the other way
+        # from the cursor and flips the rows back afterwards
+        descending = self.descending != reverse
+        if descending:
+            ordering = ('-sent_at', '-message_id')
+        else:
+            ordering = ('sent_at', 'message_id')
+
+        self.count = None
+        if str(request.query_params.get(self.count_query_param, '')).lower() in ('1', 'true'):
+            self.count = queryset.order_by()[:self.count_limit + 1].count()
+
+        page = queryset.order_by(*ordering)
+        if position is not None:
+            page = page.filter(self.beyond(position, descending))
+        rows = list(page[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.rows = rows
+        return rows
+
+    @staticmethod
+    def beyond(position, descending):
+        sent_at, message_id = position
+        if descending:
+            return Q(sent_at__lt=sent_at) | Q(sent_at=sent_at, message_id__lt=message_id)
+        return Q(sent_at__gt=sent_at) | Q(sent_at=sent_at, message_id__gt=message_id)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            sent_at = parse_datetime(data['t'])
+            if sent_at is None:
+                raise ValueError(data['t'])
+            return (sent_at, uuid.UUID(data['id'])), bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def position(row):
+        # Pages may hold Message instances or .values() rows
+        if isinstance(row, dict):
+            return row['sent_at'], row['message_id']
+        return row.sent_at, row.message_id
+
+    def encode_cursor(self, row, reverse):
+        sent_at, message_id = self.position(row)
+        data = {'t': sent_at.isoformat(), 'id': message_id.hex}
+        if reverse:
+            data['r'] = 1
+        token = base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('ascii'))
+        return replace_query_param(self.base_url, self.cursor_query_param, token.decode('ascii'))
+
+    def get_next_link(self):
+        if not self.has_next or not self.rows:
+            return None
+        return self.encode_cursor(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.rows:
+            # Ran past the end: go back to the first page
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.rows[0], reverse=True)
 
     def get_paginated_response(self, data):
-        return Response({
-            'count': self.page.paginator.count,  # Explicitly including total count
+        body = {
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
-            'results': data,
-        })
+        }
+        if self.count is not None:
+            body['count'] = min(self.count, self.count_limit)
+            body['count_is_exact'] = self.count <= self.count_limit
+        body['results'] = data
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'count_is_exact': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
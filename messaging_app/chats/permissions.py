@@ -1,7 +1,8 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 from rest_framework import status
 from rest_framework.response import Response
-from .models import Conversation, Message
+from . import membership
+from .models import Conversation, ConversationParticipant, Message
 
 
 class IsParticipantOfConversation(BasePermission):
@@ -28,17 +29,19 @@ class IsParticipantOfConversation(BasePermission):
 
         # Allow safe methods (GET, HEAD, OPTIONS) only if user is participant
         if request.method in SAFE_METHODS:
-            return user in obj.participants.all() if hasattr(obj, 'participants') else user == obj.sender
+            return membership.is_participant(user, obj.conversation_id) if isinstance(obj, Conversation) else user.pk == obj.sender_id
 
-        # For modifying methods, check that user is participant in conversation
+        # For modifying methods, check that user is participant in conversation.
+        # Writes ask the database rather than the membership cache.
         if request.method in ['PUT', 'PATCH', 'DELETE', 'POST']:
             # If obj is a Conversation, check participants
-            if hasattr(obj, 'participants'):
-                return user in obj.participants.all()
+            if isinstance(obj, Conversation):
+                return obj.has_participant(user)
 
-            # If obj is a Message, check participants via message.conversation
-            if hasattr(obj, 'conversation'):
-                return user in obj.conversation.participants.all()
+            # If obj is a Message, check participants of its conversation
+            # (by id, without loading the conversation)
+            if isinstance(obj, Message):
+                return ConversationParticipant.is_member(obj.conversation_id, user)
 
         # Deny by default
         return False
@@ -0,0 +1,49 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+
+# Full-text search over Message.message_body.
+#
+# SQLite: a contentless FTS5 table, kept in sync with chats_message by
+# triggers so bulk_create() and queryset.update()/delete() (which send no
+# signals) are indexed too. Its rowids come from chats_message_fts_key,
+# which maps each message_id to a stable integer.
+# MySQL: a FULLTEXT index queried with MATCH ... AGAINST.
+# Other databases fall back to icontains.
+#
+# The index itself is created by the migrations, from SQL frozen next to
+# them (chats/migrations/_search_*.py); this module only queries it.
+
+FTS_TABLE = 'chats_message_fts'
+KEY_TABLE = 'chats_message_fts_key'
+
+_WORDS = re.compile(r'\w+')
+
+
+def body_matches(term):
+    """
+    Return a filter() condition for messages whose body contains `term`.
+
+    Words in `term` match as prefixes ("deploy" finds "deployment"), case-
+    and accent-insensitively. On SQLite and MySQL the condition is answered
+    from the full-text index instead of scanning message bodies. Returns
+    None when `term` has nothing the index can match (e.g. only punctuation).
+    """
+    if connection.vendor not in ('sqlite', 'mysql'):
+        return Q(message_body__icontains=term)
+    words = _WORDS.findall(term)
+    if not words:
+        return None
+    if connection.vendor == 'sqlite':
+        # One phrase, so "hello-world" finds "hello world" but not "world hello"
+        phrase = '"' + ' '.join(words) + '"*'
+        sql = (
+            f'"chats_message"."message_id" IN (SELECT {KEY_TABLE}.message_id FROM {FTS_TABLE} '
+            f'JOIN {KEY_TABLE} ON {KEY_TABLE}.id = {FTS_TABLE}.rowid WHERE {FTS_TABLE} MATCH %s)'
+        )
+        return RawSQL(sql, [phrase], output_field=BooleanField())
+    query = ' '.join(f'+{word}*' for word in words)
+    sql = 'MATCH (`chats_message`.`message_body`) AGAINST (%s IN BOOLEAN MODE)'
+    return RawSQL(sql, [query], output_field=BooleanField())
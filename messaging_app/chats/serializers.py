@@ -1,8 +1,49 @@
 from rest_framework import serializers
+from .fieldsets import FULL
 from .models import User, Conversation, Message
 
 
-class UserSerializer(serializers.ModelSerializer):
+class IdListField(serializers.Field):
+    # A to-many relation collapsed to the ids of the related objects
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        objects = value.all() if hasattr(value, 'all') else value
+        return [str(obj.pk) for obj in objects]
+
+
+class SparseFieldsMixin:
+    """
+    Apply a chats.fieldsets.FieldSelection (?fields=, ?omit=, ?expand=).
+
+    The selection is passed as `selection=` or found in context['selection'].
+    Fields it leaves out are removed; relations named in `collapsed_fields`
+    are rendered as ids unless the selection expands them, in which case
+    the nested serializer gets the nested part of the selection.
+    """
+    collapsed_fields = {}  # Relation name -> factory for its collapsed field
+
+    def __init__(self, *args, selection=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.selection = selection or self.context.get('selection') or FULL
+        if self.selection.is_full:
+            return
+        for name, field in list(self.fields.items()):
+            if not self.selection.includes(name):
+                del self.fields[name]
+            elif name not in self.collapsed_fields:
+                continue
+            elif not self.selection.is_expanded(name):
+                self.fields[name] = self.collapsed_fields[name]()
+            elif isinstance(field, serializers.BaseSerializer):
+                many = isinstance(field, serializers.ListSerializer)
+                serializer_class = type(field.child if many else field)
+                self.fields[name] = serializer_class(many=many, read_only=True, selection=self.selection.child(name))
+
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Explicitly declare a CharField (e.g., for role) to satisfy the check
     role = serializers.CharField()
 
@@ -12,9 +53,10 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['user_id', 'created_at']
 
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
     message_body = serializers.CharField()
+    collapsed_fields = {'sender': lambda: serializers.UUIDField(source='sender_id', read_only=True)}
 
     class Meta:
         model = Message
@@ -22,9 +64,10 @@ class MessageSerializer(serializers.ModelSerializer):
         read_only_fields = ['message_id', 'sent_at']
 
 
-class ConversationSerializer(serializers.ModelSerializer):
+class ConversationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     participants = UserSerializer(many=True, read_only=True)
     messages = serializers.SerializerMethodField()  # Use SerializerMethodField for messages
+    collapsed_fields = {'participants': IdListField, 'messages': IdListField}
 
     class Meta:
         model = Conversation
@@ -32,9 +75,13 @@ class ConversationSerializer(serializers.ModelSerializer):
         read_only_fields = ['conversation_id', 'created_at']
 
     def get_messages(self, obj):
-        # Return serialized messages ordered by sent_at ascending
-        messages = obj.messages.order_by('sent_at')
-        return MessageSerializer(messages, many=True).data
+        # Return serialized messages ordered by sent_at ascending.
+        # ConversationViewSet prefetches them in that order with their senders.
+        if 'messages' in getattr(obj, '_prefetched_objects_cache', {}):
+            messages = obj.messages.all()
+        else:
+            messages = obj.messages.select_related('sender').order_by('sent_at')
+        return MessageSerializer(messages, many=True, selection=self.selection.child('messages')).data
 
 
     def validate(self, data):
@@ -42,3 +89,18 @@ class ConversationSerializer(serializers.ModelSerializer):
         if not self.instance and ('participants' not in self.initial_data or not self.initial_data['participants']):
             raise serializers.ValidationError("A conversation must have at least one participant.")
         return data
+
+
+class ConversationListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Summary used by the conversation list: only the latest few messages are
+    # embedded (prefetched by ConversationViewSet into `latest_messages`).
+    participants = UserSerializer(many=True, read_only=True)
+    message_count = serializers.IntegerField(read_only=True)
+    last_message_at = serializers.DateTimeField(read_only=True)
+    latest_messages = MessageSerializer(many=True, read_only=True)
+    collapsed_fields = {'participants': IdListField, 'latest_messages': IdListField}
+
+    class Meta:
+        model = Conversation
+        fields = ['conversation_id', 'participants', 'created_at', 'message_count', 'last_message_at', 'latest_messages']
+        read_only_fields = fields
@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import membership
+from .models import ConversationParticipant
+
+
+# Drop cached conversation-id sets whenever membership changes.
+
+def invalidate(user_ids):
+    # Once now, so this request sees the change, and again after commit:
+    # a concurrent request may re-cache the old set in between
+    user_ids = list(user_ids)
+    membership.invalidate(user_ids)
+    transaction.on_commit(lambda: membership.invalidate(user_ids))
+
+
+@receiver(m2m_changed, sender=ConversationParticipant)
+def participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # user.conversations.add(...): only that user's set changes
+        invalidate([instance.pk])
+    elif action == 'pre_clear':
+        # The cleared users aren't passed in, so look them up first
+        invalidate(instance.participants.values_list('pk', flat=True))
+    else:
+        invalidate(pk_set or ())
+
+
+@receiver(post_save, sender=ConversationParticipant)
+@receiver(post_delete, sender=ConversationParticipant)
+def participant_saved_or_deleted(sender, instance, **kwargs):
+    # Rows created or deleted directly, and the cascade when a conversation
+    # or user is deleted
+    invalidate([instance.user_id])
+
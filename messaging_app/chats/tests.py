@@ -1,3 +1,623 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from . import membership
+from .models import Conversation, ConversationParticipant, Message, User
+from .pagination import MessageCursorPagination
+from .views import ConversationViewSet, MessageViewSet
+
+
+def make_user(name):
+    return User.objects.create_user(
+        username=name, email=f"{name}@example.com", password=None,
+        first_name=name.title(), last_name="Test",
+    )
+
+
+class ChatsTestCase(APITestCase):
+
+    def setUp(self):
+        # Membership sets are cached; don't let them leak between tests
+        cache.clear()
+
+    def start_conversation(self, messages, body="message {}"):
+        # alice (logged in) and bob, taking turns to send `messages` messages
+        self.user = make_user("alice")
+        self.other = make_user("bob")
+        self.client.force_authenticate(self.user)
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.set([self.user, self.other])
+        for n in range(messages):
+            Message.objects.create(sender=self.other if n % 2 else self.user,
+                                   conversation=self.conversation, message_body=body.format(n))
+
+    def assertSameAsDRF(self, viewset, url):
+        # Fetch with both read paths; they must agree byte for byte
+        fast = self.client.get(url)
+        with patch.object(viewset, 'fast_read', False):
+            slow = self.client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+        return fast.json()
+
+
+class ConversationListQueryTests(ChatsTestCase):
+    """The conversation list must not issue queries per conversation or message."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user("alice")
+        self.client.force_authenticate(self.user)
+
+    def add_conversations(self, count, messages=3):
+        for _ in range(count):
+            other = make_user(f"user{User.objects.count()}")
+            conversation = Conversation.objects.create()
+            conversation.participants.set([self.user, other])
+            for n in range(messages):
+                Message.objects.create(
+                    sender=other if n % 2 else self.user,
+                    conversation=conversation,
+                    message_body=f"message {n}",
+                )
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('conversation-list'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data
+
+    def test_query_count_is_constant(self):
+        self.add_conversations(2)
+        small, _ = self.count_list_queries()
+        self.add_conversations(18, messages=6)
+        large, data = self.count_list_queries()
+
+        self.assertEqual(small, large)
+        # Membership ids (cold cache), page count, page, prefetched messages
+        # with senders, participants
+        self.assertEqual(large, 5)
+        self.assertEqual(len(data['results']), 20)
+        warm, _ = self.count_list_queries()
+        self.assertEqual(warm, 4)
+
+    def test_retrieve_includes_full_history(self):
+        self.add_conversations(1, messages=5)
+        conversation = Conversation.objects.get()
+        response = self.client.get(reverse('conversation-detail', args=[conversation.pk]))
+        messages = response.data['messages']
+        self.assertEqual([m['message_body'] for m in messages], [f"message {n}" for n in range(5)])
+        self.assertEqual(messages[0]['sender']['email'], "alice@example.com")
+
+
+class ConversationListPreviewTests(ChatsTestCase):
+    """The list embeds only the latest messages of each conversation."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user("alice")
+        self.client.force_authenticate(self.user)
+
+    def add_conversation(self, messages, start):
+        conversation = Conversation.objects.create()
+        conversation.participants.set([self.user])
+        for n in range(messages):
+            Message.objects.create(
+                sender=self.user, conversation=conversation, message_body=f"message {n}",
+                sent_at=start + timedelta(minutes=n),
+            )
+        return conversation
+
+    def test_latest_messages_and_summary(self):
+        start = timezone.now() - timedelta(days=1)
+        busy = self.add_conversation(10, start)
+        quiet = self.add_conversation(1, start + timedelta(hours=1))
+        empty = self.add_conversation(0, start)
+
+        response = self.client.get(reverse('conversation-list'))
+        results = response.data['results']
+
+        # Most recently active first, conversations without messages last
+        self.assertEqual([r['conversation_id'] for r in results], [str(quiet.pk), str(busy.pk), str(empty.pk)])
+        busy_data = results[1]
+        self.assertEqual(busy_data['message_count'], 10)
+        self.assertEqual(
+            [m['message_body'] for m in busy_data['latest_messages']],
+            ["message 7", "message 8", "message 9"],
+        )
+        self.assertEqual(busy_data['last_message_at'], busy_data['latest_messages'][-1]['sent_at'])
+        self.assertNotIn('messages', busy_data)
+        self.assertEqual(results[2]['message_count'], 0)
+        self.assertEqual(results[2]['latest_messages'], [])
+        self.assertIsNone(results[2]['last_message_at'])
+
+    def test_message_count_only_counted_when_needed(self):
+        start = timezone.now() - timedelta(days=1)
+        busy = self.add_conversation(3, start)
+        quiet = self.add_conversation(1, start + timedelta(hours=1))
+        url = reverse('conversation-list') + '?fields=conversation_id&ordering='
+
+        def ids(ordering):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url + ordering)
+            counted = any('COUNT(*)' in q['sql'] and 'chats_message' in q['sql'] for q in queries)
+            return [r['conversation_id'] for r in response.data['results']], counted
+
+        self.assertEqual(ids('-message_count'), ([str(busy.pk), str(quiet.pk)], True))
+        self.assertEqual(ids('message_count'), ([str(quiet.pk), str(busy.pk)], True))
+        # Not a valid ordering term, so the default ordering and no count
+        self.assertEqual(ids('not_message_count'), ([str(quiet.pk), str(busy.pk)], False))
+
+
+class MessageCursorPaginationTests(ChatsTestCase):
+    """Messages are paged by (sent_at, message_id) cursors."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user("alice")
+        self.client.force_authenticate(self.user)
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.set([self.user])
+        self.url = reverse('conversation-messages-list', args=[self.conversation.pk])
+        start = timezone.now() - timedelta(days=1)
+        # Three messages per timestamp, so pages have to break ties by id
+        self.messages = [
+            Message.objects.create(
+                sender=self.user, conversation=self.conversation,
+                message_body=f"message {n}", sent_at=start + timedelta(seconds=n // 3),
+            )
+            for n in range(25)
+        ]
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(m['message_id'] for m in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_walks_every_message_once_newest_first(self):
+        ids = self.walk(self.url + '?page_size=4')
+        expected = sorted(self.messages, key=lambda m: (m.sent_at, m.message_id.hex), reverse=True)
+        self.assertEqual(ids, [str(m.message_id) for m in expected])
+
+    def test_oldest_first(self):
+        ids = self.walk(self.url + '?page_size=7&ordering=sent_at')
+        expected = sorted(self.messages, key=lambda m: (m.sent_at, m.message_id.hex))
+        self.assertEqual(ids, [str(m.message_id) for m in expected])
+
+    def test_stable_under_inserts(self):
+        first = self.client.get(self.url + '?page_size=10').data
+        # New messages arrive at the top while the client scrolls down
+        for n in range(5):
+            Message.objects.create(sender=self.user, conversation=self.conversation, message_body=f"new {n}")
+        rest = self.walk(first['next'])
+        seen = [m['message_id'] for m in first['results']] + rest
+        self.assertEqual(sorted(seen), sorted(str(m.message_id) for m in self.messages))
+
+    def test_previous_returns_the_earlier_page(self):
+        first = self.client.get(self.url + '?page_size=5').data
+        second = self.client.get(first['next']).data
+        self.assertIsNone(first['previous'])
+        back = self.client.get(second['previous']).data
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_no_count_query_by_default(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertNotIn('count', response.data)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries))
+
+    def test_optional_capped_count(self):
+        response = self.client.get(self.url + '?count=1')
+        self.assertEqual(response.data['count'], 25)
+        self.assertTrue(response.data['count_is_exact'])
+        with patch.object(MessageCursorPagination, 'count_limit', 10):
+            response = self.client.get(self.url + '?count=1')
+        self.assertEqual(response.data['count'], 10)
+        self.assertFalse(response.data['count_is_exact'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class MembershipTests(ChatsTestCase):
+    """Membership checks are single EXISTS queries on the participants table."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user("alice")
+        self.outsider = make_user("mallory")
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.set([self.user] + [make_user(f"member{n}") for n in range(30)])
+        self.message = Message.objects.create(sender=self.user, conversation=self.conversation, message_body="hi")
+
+    def test_has_participant_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(self.conversation.has_participant(self.user))
+        with self.assertNumQueries(1):
+            self.assertFalse(self.conversation.has_participant(self.outsider))
+
+    def test_is_member_by_id(self):
+        self.assertTrue(ConversationParticipant.is_member(self.message.conversation_id, self.user))
+        self.assertFalse(ConversationParticipant.is_member(self.message.conversation_id, self.outsider))
+
+    def test_create_message_requires_membership(self):
+        url = reverse('conversation-messages-list', args=[self.conversation.pk])
+        data = {'conversation_id': str(self.conversation.pk), 'message_body': "hello"}
+        self.client.force_authenticate(self.outsider)
+        self.assertEqual(self.client.post(url, data).status_code, 403)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.post(url, data).status_code, 201)
+
+
+class MembershipCacheTests(ChatsTestCase):
+    """Each user's conversation ids are cached and dropped when membership changes."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user("alice")
+        self.other = make_user("bob")
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.set([self.user])
+
+    def assertCached(self, user, ids):
+        self.assertEqual(membership.conversation_ids(user), frozenset(ids))
+        with self.assertNumQueries(0):
+            self.assertEqual(membership.conversation_ids(user), frozenset(ids))
+
+    def test_cached_after_first_lookup(self):
+        with self.assertNumQueries(1):
+            membership.conversation_ids(self.user)
+        self.assertCached(self.user, [self.conversation.pk])
+
+    def test_add_and_remove(self):
+        self.assertCached(self.other, [])
+        self.conversation.participants.add(self.other)
+        self.assertCached(self.other, [self.conversation.pk])
+        self.conversation.participants.remove(self.other)
+        self.assertCached(self.other, [])
+
+    def test_reverse_add_and_clear(self):
+        self.assertCached(self.user, [self.conversation.pk])
+        second = Conversation.objects.create()
+        self.user.conversations.add(second)
+        self.assertCached(self.user, [self.conversation.pk, second.pk])
+        self.conversation.participants.clear()
+        self.assertCached(self.user, [second.pk])
+
+    def test_through_rows_and_deletes(self):
+        self.assertCached(self.other, [])
+        ConversationParticipant.objects.create(conversation=self.conversation, user=self.other)
+        self.assertCached(self.other, [self.conversation.pk])
+        self.conversation.delete()
+        self.assertCached(self.other, [])
+
+    def test_invalidated_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.conversation.participants.add(self.other)
+            # A concurrent request re-caches the set from before the commit
+            cache.set(membership.cache_key(self.other.pk), frozenset(), membership.CACHE_TIMEOUT)
+        self.assertCached(self.other, [self.conversation.pk])
+
+    def test_writes_check_the_database(self):
+        message = Message.objects.create(sender=self.user, conversation=self.conversation, message_body="hi")
+        self.client.force_authenticate(self.user)
+        membership.conversation_ids(self.user)
+        # Removed behind the ORM's back, so the cached set still has it
+        ConversationParticipant.objects.filter(user=self.user).delete()
+        cache.set(membership.cache_key(self.user.pk), frozenset([self.conversation.pk]), membership.CACHE_TIMEOUT)
+        url = reverse('conversation-messages-detail', args=[self.conversation.pk, message.pk])
+        self.assertEqual(self.client.patch(url, {'message_body': "edited"}).status_code, 403)
+        self.assertEqual(self.client.delete(url).status_code, 403)
+
+    def test_deploy_check_requires_a_shared_cache(self):
+        def errors():
+            return [e.id for e in run_checks(include_deployment_checks=True) if e.id.startswith('chats.')]
+
+        self.assertEqual(errors(), ['chats.E001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                                   'LOCATION': 'redis://127.0.0.1:6379/1'}}):
+            self.assertEqual(errors(), [])
+
+    def test_querysets_skip_the_participants_join(self):
+        self.client.force_authenticate(self.user)
+        membership.conversation_ids(self.user)
+        url = reverse('conversation-messages-list', args=[self.conversation.pk])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertFalse(any('chats_conversation_participants' in q['sql'] for q in queries))
+
+
+class BulkMessageTests(ChatsTestCase):
+    """POST .../messages/bulk/ inserts many messages with bulk_create."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user("alice")
+        self.client.force_authenticate(self.user)
+        self.first, self.second, self.foreign = (Conversation.objects.create() for _ in range(3))
+        self.first.participants.set([self.user])
+        self.second.participants.set([self.user])
+        self.foreign.participants.set([make_user("bob")])
+        self.url = reverse('conversation-messages-bulk', args=[self.first.pk])
+
+    def test_bulk_across_conversations(self):
+        items = [
+            {'conversation_id': str(conversation.pk), 'message_body': f"message {n}"}
+            for n, conversation in enumerate([self.first, self.second] * 30)
+        ]
+        with patch('chats.views.MessageViewSet.bulk_batch_size', 25):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, {'messages': items}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 60)
+        self.assertEqual(Message.objects.filter(conversation=self.second).count(), 30)
+        ids = {str(pk) for pk in Message.objects.values_list('message_id', flat=True)}
+        self.assertEqual({r['message_id'] for r in response.data['results']}, ids)
+        # One membership lookup and three INSERTs of at most 25 rows
+        inserts = [q for q in queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(sum('chats_conversation_participants' in q['sql'] for q in queries), 1)
+
+    def test_per_item_results(self):
+        items = [
+            {'conversation_id': str(self.first.pk), 'message_body': "ok"},
+            {'conversation_id': str(self.foreign.pk), 'message_body': "not mine"},
+            {'conversation_id': "nope", 'message_body': "bad id"},
+            {'conversation_id': str(self.second.pk), 'message_body': ""},
+            "not an object",
+        ]
+        response = self.client.post(self.url, items, format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r['status'] for r in response.data['results']], [201, 403, 400, 400, 400])
+        self.assertEqual(Message.objects.get().message_body, "ok")
+
+    def test_nothing_valid(self):
+        items = [{'conversation_id': str(self.foreign.pk), 'message_body': "not mine"}]
+        response = self.client.post(self.url, {'messages': items}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Message.objects.exists())
+
+    def test_empty_and_oversized_requests(self):
+        self.assertEqual(self.client.post(self.url, {'messages': []}, format='json').status_code, 400)
+        items = [{'conversation_id': str(self.first.pk), 'message_body': "x"}] * 3
+        with patch('chats.views.MessageViewSet.bulk_max_messages', 2):
+            self.assertEqual(self.client.post(self.url, items, format='json').status_code, 400)
+
+
+class FastSerializerTests(ChatsTestCase):
+    """The fast read path renders byte-for-byte what the DRF serializers do."""
+
+    def setUp(self):
+        super().setUp()
+        self.start_conversation(5, body="héllo {}")
+        self.user.phone_number = "+254700000000"
+        self.user.save()
+        self.message = Message.objects.filter(sender=self.user).first()  # Only senders may read a message
+
+    def test_conversation_list_and_detail(self):
+        self.assertSameAsDRF(ConversationViewSet, reverse('conversation-list'))
+        self.assertSameAsDRF(ConversationViewSet, reverse('conversation-detail', args=[self.conversation.pk]))
+
+    def test_message_list_and_detail(self):
+        url = reverse('conversation-messages-list', args=[self.conversation.pk])
+        self.assertSameAsDRF(MessageViewSet, url)
+        self.assertSameAsDRF(MessageViewSet, url + '?page_size=2&ordering=sent_at')
+        self.assertSameAsDRF(MessageViewSet, reverse('conversation-messages-detail',
+                                                     args=[self.conversation.pk, self.message.pk]))
+
+    def test_message_list_builds_no_instances(self):
+        url = reverse('conversation-messages-list', args=[self.conversation.pk])
+        with patch.object(Message, '__init__', side_effect=AssertionError("instance built")):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class SparseFieldsetTests(ChatsTestCase):
+    """?fields=, ?omit= and ?expand= shape responses and the queries behind them."""
+
+    def setUp(self):
+        super().setUp()
+        self.start_conversation(4)
+        self.messages_url = reverse('conversation-messages-list', args=[self.conversation.pk])
+        self.detail_url = reverse('conversation-detail', args=[self.conversation.pk])
+
+    def test_message_fields_collapse_sender(self):
+        data = self.assertSameAsDRF(MessageViewSet, self.messages_url + '?fields=message_id,sender')
+        message = data['results'][0]
+        self.assertEqual(list(message), ['message_id', 'sender'])
+        self.assertIn(message['sender'], {str(self.user.pk), str(self.other.pk)})
+
+    def test_message_expand_and_dotted_fields(self):
+        data = self.assertSameAsDRF(MessageViewSet, self.messages_url + '?fields=sender&expand=sender')
+        self.assertEqual(len(data['results'][0]['sender']), 7)
+        data = self.assertSameAsDRF(MessageViewSet, self.messages_url + '?fields=message_body,sender.email')
+        self.assertEqual(list(data['results'][0]), ['sender', 'message_body'])
+        self.assertEqual(list(data['results'][0]['sender']), ['email'])
+
+    def test_omit(self):
+        data = self.assertSameAsDRF(MessageViewSet, self.messages_url + '?omit=message_body,sender.phone_number,sender.created_at')
+        message = data['results'][0]
+        self.assertEqual(list(message), ['message_id', 'sender', 'sent_at'])
+        self.assertEqual(list(message['sender']), ['user_id', 'first_name', 'last_name', 'email', 'role'])
+
+    def test_conversations(self):
+        data = self.assertSameAsDRF(ConversationViewSet, reverse('conversation-list') + '?fields=conversation_id,latest_messages')
+        self.assertEqual(list(data['results'][0]), ['conversation_id', 'latest_messages'])
+        self.assertEqual(len(data['results'][0]['latest_messages']), 3)
+        self.assertIsInstance(data['results'][0]['latest_messages'][0], str)
+
+        data = self.assertSameAsDRF(ConversationViewSet, self.detail_url + '?fields=participants.email,messages.message_body')
+        self.assertEqual(sorted(p['email'] for p in data['participants']), ["alice@example.com", "bob@example.com"])
+        self.assertEqual([m['message_body'] for m in data['messages']], [f"message {n}" for n in range(4)])
+
+        data = self.assertSameAsDRF(ConversationViewSet, self.detail_url + '?omit=messages')
+        self.assertNotIn('messages', data)
+        self.assertEqual(len(data['participants'][0]), 7)
+
+    def test_queries_skip_unrequested_joins_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.messages_url + '?fields=message_id,sender')
+        sql = queries[-1]['sql']
+        self.assertNotIn('chats_user', sql)
+        self.assertNotIn('message_body', sql)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.detail_url + '?fields=conversation_id')
+        self.assertFalse(any('chats_message' in q['sql'] or 'chats_user' in q['sql'] for q in queries))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('conversation-list') + '?fields=conversation_id,participants')
+        users = [q['sql'] for q in queries if 'FROM "chats_user"' in q['sql']]
+        self.assertEqual(len(users), 1)
+        self.assertNotIn('"email"', users[0])
+
+
+class MessageSearchTests(ChatsTestCase):
+    """?search= matches message bodies through the full-text index."""
+
+    def setUp(self):
+        super().setUp()
+        self.start_conversation(0)
+        foreign = Conversation.objects.create()
+        foreign.participants.set([self.other])
+        self.deploy = Message.objects.create(sender=self.other, conversation=self.conversation,
+                                             message_body="The deployment is done")
+        self.lunch = Message.objects.create(sender=self.user, conversation=self.conversation,
+                                            message_body="Lunch at the Café?")
+        Message.objects.create(sender=self.other, conversation=foreign, message_body="Deploy again")
+        self.url = reverse('conversation-messages-list', args=[self.conversation.pk])
+
+    def search(self, term):
+        response = self.client.get(self.url, {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return {m['message_body'] for m in response.data['results']}
+
+    def test_words_match_as_prefixes(self):
+        self.assertEqual(self.search("DEPLOY"), {"The deployment is done"})
+        self.assertEqual(self.search("cafe"), {"Lunch at the Café?"})
+        self.assertEqual(self.search("deploy lunch"), set())
+        self.assertEqual(self.search("ployment"), set())  # Words, not substrings
+        self.assertEqual(self.search("?!"), set())
+
+    def test_sender_email_still_searched(self):
+        self.assertEqual(self.search("bob@"), {"The deployment is done"})
+        self.assertEqual(self.search("bob done"), {"The deployment is done"})
+
+    def test_index_follows_writes(self):
+        items = [{'conversation_id': str(self.conversation.pk), 'message_body': "bulk kangaroo"}]
+        self.client.post(reverse('conversation-messages-bulk', args=[self.conversation.pk]), items, format='json')
+        self.assertEqual(self.search("kangaroo"), {"bulk kangaroo"})
+
+        Message.objects.filter(pk=self.lunch.pk).update(message_body="Dinner instead")
+        self.assertEqual(self.search("lunch"), set())
+        self.assertEqual(self.search("dinner"), {"Dinner instead"})
+
+        self.deploy.delete()
+        self.assertEqual(self.search("deployment"), set())
+
+    @skipUnless(connection.vendor == 'sqlite', "implicit rowids are SQLite's")
+    def test_index_survives_renumbered_rowids(self):
+        # As VACUUM or a table rebuild may do to chats_message
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE chats_message SET rowid = -rowid')
+        self.assertEqual(self.search("deploy"), {"The deployment is done"})
+        self.assertEqual(self.search("cafe"), {"Lunch at the Café?"})
+
+        self.deploy.delete()
+        Message.objects.filter(pk=self.lunch.pk).update(message_body="Dinner instead")
+        self.assertEqual(self.search("deploy"), set())
+        self.assertEqual(self.search("dinner"), {"Dinner instead"})
+
+    def test_body_is_not_scanned(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.search("deploy")
+        sql = queries[-1]['sql']
+        self.assertIn('MATCH', sql)
+        self.assertNotIn('"message_body" LIKE', sql)
+
+
+class QueryPlanTests(ChatsTestCase):
+    """Every query behind the chats endpoints is answered from an index."""
+
+    def setUp(self):
+        super().setUp()
+        self.start_conversation(30)
+        self.messages_url = reverse('conversation-messages-list', args=[self.conversation.pk])
+
+    def full_scans(self, sql):
+        # The steps of the plan for `sql` that read a whole table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute('EXPLAIN ' + sql)
+                columns = [column[0] for column in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                return [f"{row['table']}: type ALL" for row in rows if row['type'] == 'ALL']
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            details = [row[-1] for row in cursor.fetchall()]
+        tables = set(connection.introspection.table_names())
+        # "SEARCH t USING INDEX ..." looks rows up; "SCAN t" (with or without
+        # a covering index) reads all of them. Subquery scans and FTS5 MATCH
+        # lookups ("VIRTUAL TABLE INDEX 0:M...") are fine.
+        return [
+            detail for detail in details
+            if detail.startswith('SCAN ') and detail.split()[1] in tables and ':M' not in detail
+        ]
+
+    def assertNoFullScans(self, *urls):
+        failures = []
+        for url in urls:
+            cache.clear()  # Include the membership lookup
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            for query in queries:
+                if query['sql'].startswith('SELECT'):
+                    failures.extend(f"{url}\n  {query['sql']}\n  {scan}" for scan in self.full_scans(query['sql']))
+        self.assertFalse(failures, "Full table scans:\n" + "\n".join(failures))
+
+    def test_conversations(self):
+        self.assertNoFullScans(
+            reverse('conversation-list'),
+            reverse('conversation-list') + '?ordering=-message_count',
+            reverse('conversation-detail', args=[self.conversation.pk]),
+        )
+
+    def test_messages(self):
+        next_page = self.client.get(self.messages_url + '?page_size=10').data['next']
+        message = Message.objects.filter(sender=self.user).first()
+        self.assertNoFullScans(
+            self.messages_url,
+            self.messages_url + '?ordering=sent_at&count=1',
+            next_page,
+            self.messages_url + '?fields=message_id,sender',
+            reverse('conversation-messages-detail', args=[self.conversation.pk, message.pk]),
+        )
+
+    def test_filters_and_search(self):
+        self.assertNoFullScans(
+            self.messages_url + '?sent_after=2020-01-01T00:00:00Z&sent_before=2100-01-01T00:00:00Z',
+            self.messages_url + '?search=message',
+            self.messages_url + '?search=bob@ 12',
+        )
+
+    def test_detects_full_scans(self):
+        with CaptureQueriesContext(connection) as queries:
+            list(Message.objects.filter(message_body__contains="x"))
+        self.assertTrue(self.full_scans(queries[0]['sql']))
@@ -1,23 +1,152 @@
+import uuid
+
 from rest_framework import viewsets, status, filters
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Prefetch, Subquery, Window
+from django.db.models.functions import Coalesce, RowNumber
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Conversation, Message, User
-from .serializers import ConversationSerializer, MessageSerializer
+from . import fast_serializers, membership
+from .fieldsets import FieldSelection
+from .models import Conversation, ConversationParticipant, Message, User
+from .serializers import ConversationSerializer, ConversationListSerializer, MessageSerializer
 from .permissions import IsParticipantOfConversation
-from .filters import MessageFilter
-from .pagination import MessagePagination
+from .filters import MessageFilter, MessageSearchFilter
+from .pagination import MessageCursorPagination
+
+
+class SparseFieldsViewMixin:
+    # Reads ?fields=/?omit=/?expand= (see chats.fieldsets) once per request
+    # and hands the selection to the serializers
+
+    def get_selection(self):
+        if not hasattr(self, '_selection'):
+            self._selection = FieldSelection.from_request(self.request)
+        return self._selection
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['selection'] = self.get_selection()
+        return context
+
+
+def select_message_columns(queryset, selection):
+    # Load only what `selection` renders of each message, joining the sender
+    # only when it is expanded. Ids used for pagination and permission
+    # checks are always loaded.
+    if selection.is_full:
+        return queryset.select_related('sender')
+    columns = {'message_id', 'sent_at', 'conversation', 'sender'}
+    if selection.includes('message_body'):
+        columns.add('message_body')
+    if selection.includes('sender') and selection.is_expanded('sender'):
+        queryset = queryset.select_related('sender')
+        columns.update(f'sender__{name}' for name in selection.child('sender').select(fast_serializers.USER_FIELDS))
+    return queryset.only(*columns)
+
 
-class ConversationViewSet(viewsets.ModelViewSet):
+def select_user_columns(queryset, selection):
+    if selection.is_full:
+        return queryset
+    return queryset.only('user_id', *selection.select(fast_serializers.USER_FIELDS))
+
+
+class ConversationViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = ConversationSerializer
     permission_classes = [IsParticipantOfConversation]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['participants__email', 'conversation_id']
-    ordering_fields = ['created_at']
+    ordering_fields = ['created_at', 'last_message_at', 'message_count']
+    latest_messages = 3  # Messages embedded per conversation in the list view
+    fast_read = True  # Serialize list/retrieve with chats.fast_serializers
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ConversationListSerializer
+        return ConversationSerializer
 
     def get_queryset(self):
-        # Return only conversations where the requesting user is a participant
-        return Conversation.objects.filter(participants=self.request.user)
+        # Return only conversations where the requesting user is a participant,
+        # scoped by the cached id set instead of joining participants
+        conversations = Conversation.objects.filter(conversation_id__in=membership.conversation_ids(self.request.user))
+        # Writes always work on complete objects
+        selection = self.get_selection() if self.action in ('list', 'retrieve') else FieldSelection()
+        if self.action == 'list':
+            return self.get_list_queryset(conversations, selection)
+        # Messages (with their senders) and participants are loaded in one
+        # query each for the whole page instead of once per conversation.
+        messages = Message.objects.order_by('sent_at')
+        return conversations.prefetch_related(
+            *self.get_prefetches(selection, {'messages': ('messages', messages)})
+        )
+
+    def get_prefetches(self, selection, messages):
+        # Prefetch only the relations `selection` renders, with only the
+        # columns it renders. `messages` maps the field name to the
+        # (relation, queryset) to prefetch it from.
+        prefetches = []
+        if selection.includes('participants'):
+            if selection.is_expanded('participants'):
+                users = select_user_columns(User.objects.all(), selection.child('participants'))
+            else:
+                users = User.objects.only('user_id')
+            prefetches.append(Prefetch('participants', queryset=users))
+        for name, (relation, queryset) in messages.items():
+            if not selection.includes(name):
+                continue
+            if selection.is_expanded(name):
+                queryset = select_message_columns(queryset, selection.child(name))
+            else:
+                queryset = queryset.only('message_id', 'conversation', 'sent_at')
+            to_attr = name if name != relation else None
+            prefetches.append(Prefetch(relation, queryset=queryset, to_attr=to_attr))
+        return prefetches
+
+    def get_list_queryset(self, conversations, selection):
+        # Only the newest `latest_messages` of each conversation, picked in one
+        # ROW_NUMBER() OVER (PARTITION BY conversation_id ORDER BY sent_at DESC)
+        # query for the whole page. The full history stays on /messages/.
+        latest = Message.objects.annotate(
+            row_number=Window(RowNumber(), partition_by=F('conversation'), order_by=F('sent_at').desc()),
+        ).filter(row_number__lte=self.latest_messages).order_by('sent_at')
+
+        # Correlated subqueries rather than a join + GROUP BY, so the page
+        # count query doesn't have to touch messages at all
+        conversation_messages = Message.objects.filter(conversation=OuterRef('pk')).order_by()
+        # last_message_at is always needed: the list is ordered by it
+        annotations = {
+            'last_message_at': Subquery(conversation_messages.order_by('-sent_at').values('sent_at')[:1]),
+        }
+        # The validated ?ordering= terms, so e.g. ?ordering=not_message_count doesn't count
+        ordering = filters.OrderingFilter().get_ordering(self.request, conversations, self) or ()
+        if selection.includes('message_count') or {'message_count', '-message_count'} & set(ordering):
+            annotations['message_count'] = Coalesce(
+                Subquery(conversation_messages.values('conversation').annotate(n=Count('*')).values('n')),
+                0, output_field=IntegerField(),
+            )
+        return conversations.annotate(**annotations).prefetch_related(
+            *self.get_prefetches(selection, {'latest_messages': ('messages', latest)})
+        ).order_by(F('last_message_at').desc(nulls_last=True), '-created_at')
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_read:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.summaries(page))
+        return Response(self.summaries(queryset))
+
+    def summaries(self, conversations):
+        selection = self.get_selection()
+        return [fast_serializers.conversation_summary_data(c, selection) for c in conversations]
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.fast_read:
+            return super().retrieve(request, *args, **kwargs)
+        return Response(fast_serializers.conversation_data(self.get_object(), self.get_selection()))
 
     def create(self, request, *args, **kwargs):
         participant_ids = request.data.get('participants', [])
@@ -39,18 +168,41 @@ class ConversationViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class MessageViewSet(viewsets.ModelViewSet):
+class MessageViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = MessageSerializer
     permission_classes = [IsParticipantOfConversation]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, MessageSearchFilter, filters.OrderingFilter]
     filterset_class = MessageFilter
-    search_fields = ['sender__email', 'message_body']
+    search_fields = ['sender__email', 'message_body']  # message_body through the full-text index
     ordering_fields = ['sent_at']
-    pagination_class = MessagePagination  # Pagination with 20 per page
+    pagination_class = MessageCursorPagination  # Keyset pages of 20, no COUNT(*)
+    bulk_max_messages = 5000  # Per bulk request
+    bulk_batch_size = 500  # Rows per INSERT statement
+    fast_read = True  # Serialize list/retrieve with chats.fast_serializers
 
     def get_queryset(self):
         # Messages from conversations where the user is a participant
-        return Message.objects.filter(conversation__participants=self.request.user)
+        conversation_ids = membership.conversation_ids(self.request.user)
+        messages = Message.objects.filter(conversation_id__in=conversation_ids)
+        if self.action in ('list', 'retrieve'):
+            return select_message_columns(messages, self.get_selection())
+        return messages.select_related('sender')
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_read:
+            return super().list(request, *args, **kwargs)
+        # Rows come straight from .values(); no model instances are built
+        selection = self.get_selection()
+        rows = fast_serializers.message_values(self.filter_queryset(self.get_queryset()), selection)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response([fast_serializers.message_row_data(row, selection) for row in page])
+        return Response([fast_serializers.message_row_data(row, selection) for row in rows])
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.fast_read:
+            return super().retrieve(request, *args, **kwargs)
+        return Response(fast_serializers.message_data(self.get_object(), self.get_selection()))
 
     def create(self, request, *args, **kwargs):
         sender = request.user
@@ -66,7 +218,7 @@ class MessageViewSet(viewsets.ModelViewSet):
         except Conversation.DoesNotExist:
             return Response({"error": "Conversation not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        if sender not in conversation.participants.all():
+        if not conversation.has_participant(sender):
             return Response({"error": "You are not a participant in this conversation."},
                             status=status.HTTP_403_FORBIDDEN)
 
@@ -76,12 +228,77 @@ class MessageViewSet(viewsets.ModelViewSet):
 
     def update(self, request, *args, **kwargs):
         message = self.get_object()
-        if request.user not in message.conversation.participants.all():
+        if not ConversationParticipant.is_member(message.conversation_id, request.user):
             raise PermissionDenied("You do not have permission to update this message.")
         return super().update(request, *args, **kwargs)
 
     def destroy(self, request, *args, **kwargs):
         message = self.get_object()
-        if request.user not in message.conversation.participants.all():
+        if not ConversationParticipant.is_member(message.conversation_id, request.user):
             raise PermissionDenied("You do not have permission to delete this message.")
         return super().destroy(request, *args, **kwargs)
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        """
+        Send many messages, possibly to different conversations, in one request.
+
+        Body: {"messages": [{"conversation_id": ..., "message_body": ...}, ...]}
+        (or just the list). Membership is checked once against the sender's
+        conversation-id set, read from the database, and the valid messages are inserted with
+        bulk_create inside one transaction. Each item gets its own result;
+        the response is 201 if all were created, 207 if only some were and
+        400 if none were.
+        """
+        items = request.data.get('messages') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({"error": "A non-empty list of messages is required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.bulk_max_messages:
+            return Response({"error": f"At most {self.bulk_max_messages} messages per request."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        sender = request.user
+        allowed = membership.conversation_ids(sender, cached=False)
+        results = []
+        messages = []
+        for index, item in enumerate(items):
+            error, code = self.validate_bulk_item(item, allowed)
+            if error:
+                results.append({"index": index, "status": code, "error": error})
+                continue
+            message = Message(
+                sender=sender,
+                conversation_id=uuid.UUID(str(item['conversation_id'])),
+                message_body=item['message_body'],
+            )
+            messages.append(message)
+            results.append({"index": index, "status": status.HTTP_201_CREATED, "message_id": str(message.message_id)})
+
+        with transaction.atomic():
+            Message.objects.bulk_create(messages, batch_size=self.bulk_batch_size)
+
+        if len(messages) == len(items):
+            code = status.HTTP_201_CREATED
+        elif messages:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({"created": len(messages), "results": results}, status=code)
+
+    @staticmethod
+    def validate_bulk_item(item, allowed):
+        # Returns (error, status code) or (None, None) for a valid item
+        if not isinstance(item, dict):
+            return "Each message must be an object.", status.HTTP_400_BAD_REQUEST
+        body = item.get('message_body')
+        if not isinstance(body, str) or not body.strip():
+            return "message_body is required.", status.HTTP_400_BAD_REQUEST
+        try:
+            conversation_id = uuid.UUID(str(item.get('conversation_id')))
+        except ValueError:
+            return "conversation_id must be a valid UUID.", status.HTTP_400_BAD_REQUEST
+        if conversation_id not in allowed:
+            # Unknown conversations look the same as ones the sender isn't in
+            return "You are not a participant in this conversation.", status.HTTP_403_FORBIDDEN
+        return None, None
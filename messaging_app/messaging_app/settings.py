@@ -71,6 +71,18 @@ DATABASES = {
     }
 }
 
+# === CACHE ===
+# chats.membership caches each user's conversation ids here and drops them
+# when membership changes, so every worker process must share one cache:
+# set CACHE_URL (e.g. redis://redis:6379/1) in production. The local-memory
+# fallback is per process, which is only safe for runserver and tests;
+# `manage.py check --deploy` rejects it.
+CACHE_URL = os.getenv('CACHE_URL')
+if CACHE_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 # === PASSWORD VALIDATION ===
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
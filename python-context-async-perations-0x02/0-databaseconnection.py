@@ -1,4 +1,7 @@
 import sqlite3
+import time
+
+import instrumentation
 
 class DatabaseConnection:
     def __init__(self, db_name):
@@ -6,7 +9,13 @@ class DatabaseConnection:
         self.connection = None
 
     def __enter__(self):
-        self.connection = sqlite3.connect(self.db_name)
+        hook = instrumentation.get_hook()
+        if hook is None:
+            self.connection = sqlite3.connect(self.db_name)
+        else:
+            start = time.perf_counter()
+            self.connection = sqlite3.connect(self.db_name)
+            hook.observe("connect_seconds", None, time.perf_counter() - start)
         return self.connection  # This is passed to the `as` part of the `with` statement
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -14,26 +23,26 @@ class DatabaseConnection:
             self.connection.close()
 
 # Usage Example:
-with DatabaseConnection('example.db') as conn:
-    cursor = conn.cursor()
-
-    # (Optional) Create a sample table and insert dummy data (if not exists)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY,
-            name TEXT,
-            email TEXT
-        )
-    ''')
-    cursor.execute("INSERT OR IGNORE INTO users (id, name, email) VALUES (1, 'Alice', 'alice@example.com')")
-    cursor.execute("INSERT OR IGNORE INTO users (id, name, email) VALUES (2, 'Bob', 'bob@example.com')")
-    conn.commit()
-
-    # Now perform the required SELECT query
-    cursor.execute('SELECT * FROM users')
-    results = cursor.fetchall()
-
-    # Print results
-    for row in results:
-        print(row)
-
+if __name__ == "__main__":
+    with DatabaseConnection('example.db') as conn:
+        cursor = conn.cursor()
+
+        # (Optional) Create a sample table and insert dummy data (if not exists)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY,
+                name TEXT,
+                email TEXT
+            )
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO users (id, name, email) VALUES (1, 'Alice', 'alice@example.com')")
+        cursor.execute("INSERT OR IGNORE INTO users (id, name, email) VALUES (2, 'Bob', 'bob@example.com')")
+        conn.commit()
+
+        # Now perform the required SELECT query
+        cursor.execute('SELECT * FROM users')
+        results = cursor.fetchall()
+
+        # Print results
+        for row in results:
+            print(row)
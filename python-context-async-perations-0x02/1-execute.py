@@ -1,4 +1,7 @@
 import sqlite3
+import time
+
+import instrumentation
 
 class ExecuteQuery:
     def __init__(self, db_name, query, params=None):
@@ -10,10 +13,26 @@ class ExecuteQuery:
         self.results = None
 
     def __enter__(self):
-        self.connection = sqlite3.connect(self.db_name)
-        self.cursor = self.connection.cursor()
-        self.cursor.execute(self.query, self.params)
-        self.results = self.cursor.fetchall()
+        hook = instrumentation.get_hook()
+        if hook is None:
+            self.connection = sqlite3.connect(self.db_name)
+            self.cursor = self.connection.cursor()
+            self.cursor.execute(self.query, self.params)
+            self.results = self.cursor.fetchall()
+        else:
+            started = time.perf_counter()
+            self.connection = sqlite3.connect(self.db_name)
+            connected = time.perf_counter()
+            self.cursor = self.connection.cursor()
+            self.cursor.execute(self.query, self.params)
+            executed = time.perf_counter()
+            self.results = self.cursor.fetchall()
+            fetched = time.perf_counter()
+            hook.record_query(self.query,
+                              connect=connected - started,
+                              execute=executed - connected,
+                              fetch=fetched - executed,
+                              rows=len(self.results))
         return self.results  # Returned to the `as` variable in the `with` statement
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -1,6 +1,9 @@
 import asyncio
+import time
 import aiosqlite
 
+import instrumentation
+
 DB_NAME = "example_async.db"
 
 # Function to set up the database with test data
@@ -23,27 +26,46 @@ async def setup_database():
         ])
         await db.commit()
 
-# Asynchronous function to fetch all users
-async def async_fetch_users():
+# Run a query and return all rows, reporting timings if instrumentation is on
+async def fetch_rows(query, params=()):
+    hook = instrumentation.get_hook()
+    if hook is None:
+        async with aiosqlite.connect(DB_NAME) as db:
+            cursor = await db.execute(query, params)
+            rows = await cursor.fetchall()
+            await cursor.close()
+            return rows
+
+    started = time.perf_counter()
     async with aiosqlite.connect(DB_NAME) as db:
-        cursor = await db.execute("SELECT * FROM users")
-        users = await cursor.fetchall()
+        connected = time.perf_counter()
+        cursor = await db.execute(query, params)
+        executed = time.perf_counter()
+        rows = await cursor.fetchall()
+        fetched = time.perf_counter()
         await cursor.close()
-        print("\nAll Users:")
-        for user in users:
-            print(user)
-        return users
+    hook.record_query(query,
+                      connect=connected - started,
+                      execute=executed - connected,
+                      fetch=fetched - executed,
+                      rows=len(rows))
+    return rows
+
+# Asynchronous function to fetch all users
+async def async_fetch_users():
+    users = await fetch_rows("SELECT * FROM users")
+    print("\nAll Users:")
+    for user in users:
+        print(user)
+    return users
 
 # Asynchronous function to fetch users older than 40
 async def async_fetch_older_users():
-    async with aiosqlite.connect(DB_NAME) as db:
-        cursor = await db.execute("SELECT * FROM users WHERE age > 40")
-        older_users = await cursor.fetchall()
-        await cursor.close()
-        print("\nUsers Older Than 40:")
-        for user in older_users:
-            print(user)
-        return older_users
+    older_users = await fetch_rows("SELECT * FROM users WHERE age > 40")
+    print("\nUsers Older Than 40:")
+    for user in older_users:
+        print(user)
+    return older_users
 
 # Run both queries concurrently
 async def fetch_concurrently():
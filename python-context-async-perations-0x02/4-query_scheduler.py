@@ -0,0 +1,170 @@
+import asyncio
+import itertools
+import aiosqlite
+
+concurrent = __import__('3-concurrent')
+
+DB_NAME = concurrent.DB_NAME
+
+# Priority lanes: lower values are dispatched first
+HIGH = 0
+NORMAL = 1
+LOW = 2
+
+
+class Query:
+    """A single query to run through the scheduler."""
+
+    def __init__(self, sql, params=None, priority=NORMAL, timeout=None):
+        self.sql = sql
+        self.params = params or ()
+        self.priority = priority
+        self.timeout = timeout  # None falls back to the scheduler default
+
+    def __repr__(self):
+        return (f"Query({self.sql!r}, {self.params!r}, "
+                f"priority={self.priority})")
+
+
+class QueryResult:
+    """Outcome of a scheduled query: either rows or the error it raised."""
+
+    def __init__(self, query, rows=None, error=None):
+        self.query = query
+        self.rows = rows
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class _Stream:
+    """The queries submitted by one stream() call and their results."""
+
+    def __init__(self):
+        self.results = asyncio.Queue()
+        self.running = set()
+        self.closed = False  # Consumer is gone: skip what is still queued
+
+
+class QueryScheduler:
+    """
+    Run many queries with a bounded number in flight at once.
+
+    Unlike asyncio.gather, which starts every coroutine immediately, the
+    scheduler only holds `max_concurrency` connections open at a time,
+    dispatches queries by priority lane (HIGH, NORMAL, LOW) and yields
+    results as soon as each query completes. The lanes are shared by
+    every stream() call on the scheduler, so a HIGH query from one caller
+    is dispatched before LOW queries another caller queued earlier.
+    """
+
+    def __init__(self, db_name=DB_NAME, max_concurrency=10, timeout=None):
+        self.db_name = db_name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._lanes = asyncio.PriorityQueue()
+        self._counter = itertools.count()  # Keeps FIFO order within a lane
+        self._dispatcher = None
+
+    async def _execute(self, query):
+        async with aiosqlite.connect(self.db_name) as db:
+            cursor = await db.execute(query.sql, query.params)
+            rows = await cursor.fetchall()
+            await cursor.close()
+            return rows
+
+    async def _run(self, query, stream):
+        timeout = query.timeout if query.timeout is not None else self.timeout
+        try:
+            rows = await asyncio.wait_for(self._execute(query), timeout)
+            await stream.results.put(QueryResult(query, rows=rows))
+        except Exception as exc:  # Reported to the consumer, not raised
+            await stream.results.put(QueryResult(query, error=exc))
+
+    def _next_query(self):
+        # Highest-priority query whose stream is still being read, or None
+        while not self._lanes.empty():
+            _, _, query, stream = self._lanes.get_nowait()
+            if not stream.closed:
+                return query, stream
+        return None
+
+    async def _dispatch(self):
+        # One dispatcher per scheduler, running while any lane has work
+        while True:
+            # Only take the next query once a slot is free, so a HIGH
+            # query submitted while the scheduler is full goes next
+            await self._semaphore.acquire()
+            entry = self._next_query()
+            if entry is None:
+                self._semaphore.release()
+                return
+            query, stream = entry
+            task = asyncio.create_task(self._run(query, stream))
+            stream.running.add(task)
+            task.add_done_callback(stream.running.discard)
+            # Not a finally in _run: a task cancelled before its first
+            # step never runs it, but its done callbacks always run
+            task.add_done_callback(self._release)
+
+    def _release(self, task):
+        self._semaphore.release()
+
+    async def stream(self, queries):
+        """
+        Yield a QueryResult for each query, in completion order.
+
+        `queries` may contain Query objects, SQL strings or (sql, params)
+        tuples. Failed and timed out queries are yielded with `error` set.
+        """
+        stream = _Stream()
+        total = 0
+        for query in queries:
+            if isinstance(query, str):
+                query = Query(query)
+            elif not isinstance(query, Query):
+                query = Query(*query)
+            entry = (query.priority, next(self._counter), query, stream)
+            self._lanes.put_nowait(entry)
+            total += 1
+        if total and (self._dispatcher is None or self._dispatcher.done()):
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        try:
+            for _ in range(total):
+                yield await stream.results.get()
+        finally:
+            # Consumer broke out early: drop its queued queries and stop
+            # its running ones, which releases their slots
+            stream.closed = True
+            for task in stream.running:
+                task.cancel()
+            await asyncio.gather(*stream.running, return_exceptions=True)
+
+    async def fetch_all(self, queries):
+        """Run every query and return the results in completion order."""
+        return [result async for result in self.stream(queries)]
+
+
+# Fan out many lookups without opening one connection per query at once
+async def fetch_with_scheduler():
+    await concurrent.setup_database()
+    scheduler = QueryScheduler(max_concurrency=5, timeout=2.0)
+
+    queries = [Query("SELECT * FROM users WHERE id = ?", (user_id,))
+               for user_id in range(1, 5)]
+    queries.append(Query("SELECT * FROM users WHERE age > 40", priority=HIGH))
+
+    async for result in scheduler.stream(queries):
+        if result.ok:
+            print(f"{result.query.sql} {result.query.params}: {result.rows}")
+        else:
+            print(f"{result.query.sql} failed: {result.error!r}")
+
+
+# Entry point
+if __name__ == "__main__":
+    asyncio.run(fetch_with_scheduler())
@@ -0,0 +1,164 @@
+import asyncio
+import aiosqlite
+
+concurrent = __import__('3-concurrent')
+
+DB_NAME = concurrent.DB_NAME
+
+_STOP = object()  # Sentinel telling the writer task to shut down
+
+
+class ReadWriteExecutor:
+    """
+    Split SQLite reads and writes across separate connections.
+
+    SQLite only allows one writer at a time, so every write goes through a
+    queue drained by a single writer task. The writer commits whatever has
+    queued up (up to `batch_size` statements) in one transaction, which
+    turns many small commits into one. Reads run on a pool of read-only
+    connections; with the database in WAL mode they never wait on the
+    writer.
+
+    Usage:
+        async with ReadWriteExecutor('example.db') as executor:
+            await executor.write("INSERT INTO users (name) VALUES (?)", ('Eve',))
+            rows = await executor.read("SELECT * FROM users")
+    """
+
+    def __init__(self, db_name=DB_NAME, readers=4, batch_size=100):
+        self.db_name = db_name
+        self.readers = readers
+        self.batch_size = batch_size
+        self._writes = asyncio.Queue()
+        self._read_pool = asyncio.Queue()
+        self._read_connections = []
+        self._writer_db = None
+        self._writer_task = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def start(self):
+        # isolation_level=None lets the writer manage transactions itself
+        self._writer_db = await aiosqlite.connect(self.db_name, isolation_level=None)
+        # The switch only completes once the statement is stepped to the
+        # end; left pending, readers still block on the writer's lock
+        async with self._writer_db.execute("PRAGMA journal_mode=WAL") as cursor:
+            await cursor.fetchall()
+        self._writer_task = asyncio.create_task(self._writer())
+
+        # Readers are opened after WAL is enabled so they never take write locks
+        for _ in range(self.readers):
+            db = await aiosqlite.connect(f"file:{self.db_name}?mode=ro", uri=True)
+            self._read_connections.append(db)
+            self._read_pool.put_nowait(db)
+
+    async def close(self):
+        if self._writer_task is not None:
+            await self._writes.put(_STOP)
+            await self._writer_task
+            self._writer_task = None
+        if self._writer_db is not None:
+            await self._writer_db.close()
+            self._writer_db = None
+        for db in self._read_connections:
+            await db.close()
+        self._read_connections.clear()
+        self._read_pool = asyncio.Queue()
+
+    async def write(self, query, params=None):
+        """Queue a write and wait until it has been committed.
+
+        Returns the cursor's rowcount for the statement.
+        """
+        if self._writer_task is None:
+            raise RuntimeError("ReadWriteExecutor is not started")
+        future = asyncio.get_running_loop().create_future()
+        await self._writes.put((query, params or (), future))
+        return await future
+
+    async def read(self, query, params=None):
+        """Run a SELECT on one of the read-only connections."""
+        db = await self._read_pool.get()
+        try:
+            cursor = await db.execute(query, params or ())
+            rows = await cursor.fetchall()
+            await cursor.close()
+            return rows
+        finally:
+            self._read_pool.put_nowait(db)
+
+    async def _writer(self):
+        stopping = False
+        while not stopping:
+            # Block for the first write, then take whatever else is waiting
+            batch = [await self._writes.get()]
+            while len(batch) < self.batch_size and not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+            if _STOP in batch:
+                stopping = True
+                batch = [item for item in batch if item is not _STOP]
+            if batch:
+                await self._commit_batch(batch)
+
+    async def _commit_batch(self, batch):
+        db = self._writer_db
+        results = []
+        try:
+            await db.execute("BEGIN IMMEDIATE")
+            for query, params, future in batch:
+                # A savepoint per statement keeps one bad write from
+                # rolling back the rest of the group
+                await db.execute("SAVEPOINT write")
+                try:
+                    cursor = await db.execute(query, params)
+                    results.append((future, cursor.rowcount, None))
+                    await cursor.close()
+                    await db.execute("RELEASE write")
+                except aiosqlite.Error as exc:
+                    await db.execute("ROLLBACK TO write")
+                    await db.execute("RELEASE write")
+                    results.append((future, None, exc))
+            await db.execute("COMMIT")
+        except Exception as exc:
+            if db.in_transaction:
+                await db.execute("ROLLBACK")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for future, rowcount, error in results:
+            if future.done():  # The caller gave up waiting
+                continue
+            if error is None:
+                future.set_result(rowcount)
+            else:
+                future.set_exception(error)
+
+
+# Many concurrent inserts are grouped into a handful of commits
+async def write_and_read_concurrently():
+    await concurrent.setup_database()
+    async with ReadWriteExecutor() as executor:
+        writes = [
+            executor.write(
+                "INSERT OR IGNORE INTO users (id, name, age) VALUES (?, ?, ?)",
+                (user_id, f"User {user_id}", 20 + user_id % 50),
+            )
+            for user_id in range(100, 200)
+        ]
+        reads = [executor.read("SELECT COUNT(*) FROM users") for _ in range(10)]
+        await asyncio.gather(*writes, *reads)
+
+        rows = await executor.read("SELECT COUNT(*) FROM users")
+        print(f"Users after batched writes: {rows[0][0]}")
+
+
+# Entry point
+if __name__ == "__main__":
+    asyncio.run(write_and_read_concurrently())
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from collections import OrderedDict
+import aiosqlite
+
+concurrent = __import__('3-concurrent')
+
+DB_NAME = concurrent.DB_NAME
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one execution.
+
+    The first caller for a key starts the work; everyone who asks for the
+    same key while it is running awaits the same task. With `ttl` set, a
+    successful result is also kept for `ttl` seconds after it completes,
+    for at most `max_results` keys at a time. Errors are never cached.
+    """
+
+    def __init__(self, ttl=0, max_results=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_results = max_results
+        self._clock = clock
+        self._in_flight = {}
+        # key -> (expires_at, result), oldest first; every entry has the
+        # same ttl, so that is also the order they expire in
+        self._results = OrderedDict()
+
+    async def do(self, key, func, *args):
+        if self.ttl:
+            cached = self._results.get(key)
+            if cached is not None:
+                expires_at, result = cached
+                if self._clock() < expires_at:
+                    return result
+                del self._results[key]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # shield() so one caller being cancelled doesn't cancel the others
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._in_flight.pop(key, None)
+        if self.ttl and not task.cancelled() and task.exception() is None:
+            now = self._clock()
+            self._results.pop(key, None)
+            self._results[key] = (now + self.ttl, task.result())
+            # Keys that are never asked for again would otherwise stay forever
+            while self._results:
+                oldest_key, (expires_at, _) = next(iter(self._results.items()))
+                if expires_at > now and len(self._results) <= self.max_results:
+                    break
+                del self._results[oldest_key]
+
+    def forget(self, key=None):
+        """Drop the cached result for `key`, or every cached result."""
+        if key is None:
+            self._results.clear()
+        else:
+            self._results.pop(key, None)
+
+
+class SingleFlightFetcher:
+    """Run SELECTs so identical in-flight queries share one execution."""
+
+    def __init__(self, db_name=DB_NAME, ttl=0, max_results=1024):
+        self.db_name = db_name
+        self.flight = SingleFlight(ttl=ttl, max_results=max_results)
+        self.executions = 0
+
+    async def _fetch(self, query, params):
+        self.executions += 1
+        async with aiosqlite.connect(self.db_name) as db:
+            cursor = await db.execute(query, params)
+            rows = await cursor.fetchall()
+            await cursor.close()
+            return rows
+
+    async def fetch(self, query, params=None):
+        params = tuple(params or ())
+        rows = await self.flight.do((query, params), self._fetch, query, params)
+        # Every caller gets its own list; the row tuples are shared
+        return list(rows)
+
+
+# Deduplicated versions of the fetchers in 3-concurrent.py
+_flight = SingleFlight()
+
+
+async def single_flight_fetch_users():
+    return await _flight.do("all_users", concurrent.async_fetch_users)
+
+
+async def single_flight_fetch_older_users():
+    return await _flight.do("older_users", concurrent.async_fetch_older_users)
+
+
+# Fifty callers, one query
+async def fetch_deduplicated():
+    await concurrent.setup_database()
+    fetcher = SingleFlightFetcher(ttl=1.0)
+    results = await asyncio.gather(*[
+        fetcher.fetch("SELECT * FROM users WHERE age > ?", (40,))
+        for _ in range(50)
+    ])
+    print(f"{len(results)} callers, {fetcher.executions} query execution(s)")
+    print(results[0])
+
+
+# Entry point
+if __name__ == "__main__":
+    asyncio.run(fetch_deduplicated())
@@ -0,0 +1,114 @@
+import asyncio
+import collections
+import functools
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import aclosing
+import aiosqlite
+
+concurrent = __import__('3-concurrent')
+
+DB_NAME = concurrent.DB_NAME
+
+
+# Read a query's rows in fixed-size batches instead of one fetchall()
+async def stream_row_batches(query, params=(), batch_size=500, db_name=DB_NAME):
+    async with aiosqlite.connect(db_name) as db:
+        async with db.execute(query, params) as cursor:
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+
+async def _as_async_iter(batches):
+    if hasattr(batches, "__aiter__"):
+        async for batch in batches:
+            yield batch
+    else:
+        for batch in batches:
+            yield batch
+
+
+async def offload_batches(batches, transform, executor, max_in_flight=4):
+    """
+    Yield transform(batch) for each batch, computed in `executor`.
+
+    At most `max_in_flight` batches are handed to the pool at once; once
+    that many are pending, reading the next batch waits for the oldest
+    result, so a slow transform applies back-pressure to the source
+    instead of queueing the whole result set in memory. Results come back
+    in the same order as the batches.
+
+    `transform` runs in another process, so it must be a picklable
+    top-level function and receives plain row tuples.
+    """
+    loop = asyncio.get_running_loop()
+    pending = collections.deque()
+    try:
+        async with aclosing(_as_async_iter(batches)) as source:
+            async for batch in source:
+                pending.append(loop.run_in_executor(executor, transform, batch))
+                if len(pending) >= max_in_flight:
+                    yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        # Consumer stopped early: don't start work nobody will read
+        for future in pending:
+            future.cancel()
+
+
+async def process_query(query, transform, params=(), batch_size=500,
+                        max_in_flight=4, max_workers=None, db_name=DB_NAME,
+                        executor=None):
+    """
+    Run `query` and yield the transformed batches from a process pool.
+
+    Pass `executor` to reuse a pool across queries; otherwise one with
+    `max_workers` processes is created and shut down when the generator
+    finishes or is closed. Close the generator (e.g. with
+    contextlib.aclosing) when breaking out early, so the database
+    connection and the pool are released straight away.
+    """
+    owned = executor is None
+    if owned:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        batches = stream_row_batches(query, params, batch_size, db_name)
+        async with aclosing(batches), \
+                aclosing(offload_batches(batches, transform, executor,
+                                         max_in_flight)) as results:
+            async for result in results:
+                yield result
+    finally:
+        if owned:
+            # shutdown() waits for the workers; keep that off the event loop
+            shutdown = functools.partial(executor.shutdown, wait=True,
+                                         cancel_futures=True)
+            await asyncio.get_running_loop().run_in_executor(None, shutdown)
+
+
+# Example CPU-bound transform; runs in a worker process
+def describe_users(rows):
+    described = []
+    for user_id, name, age in rows:
+        digest = hashlib.sha256(name.encode())
+        for _ in range(10000):
+            digest = hashlib.sha256(digest.digest())
+        described.append(f"{user_id}: {name} ({age}) {digest.hexdigest()[:12]}")
+    return described
+
+
+async def fetch_and_process_users():
+    await concurrent.setup_database()
+    async for lines in process_query("SELECT * FROM users", describe_users,
+                                     batch_size=2):
+        for line in lines:
+            print(line)
+
+
+# Entry point
+if __name__ == "__main__":
+    asyncio.run(fetch_and_process_users())
@@ -0,0 +1,221 @@
+"""
+Optional latency instrumentation for the database helpers.
+
+Nothing is recorded until a hook is installed:
+
+    metrics = instrumentation.QueryMetrics()
+    instrumentation.set_hook(metrics)
+
+DatabaseConnection, ExecuteQuery and the async fetchers then report
+connect, execute and fetch times plus rows returned, tagged by a
+fingerprint of the SQL (literals replaced by `?`). When no hook is set
+the helpers only pay for one `get_hook() is None` check.
+"""
+import functools
+import json
+import math
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS = ("connect_seconds", "execute_seconds", "fetch_seconds", "rows")
+PERCENTILES = (50, 90, 99, 99.9)
+
+_hook = None
+
+
+def set_hook(hook):
+    """Install `hook` (usually a QueryMetrics); pass None to disable."""
+    global _hook
+    _hook = hook
+
+
+def get_hook():
+    return _hook
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(query):
+    """Normalise a query so that calls differing only by literals match."""
+    if query is None:
+        return ""
+    query = _STRING.sub("?", query)
+    query = _NUMBER.sub("?", query)
+    query = _IN_LIST.sub("(?)", query)
+    return _SPACE.sub(" ", query).strip()
+
+
+class Histogram:
+    """
+    HDR-style histogram with log-linear buckets.
+
+    Each power of two is split into `sub_buckets` equal buckets and a
+    percentile is reported as the midpoint of its bucket, so it is within
+    1 / (2 * sub_buckets) of the true value (relative error) no matter how
+    large or small it is, with memory bounded by the range of values
+    rather than their number.
+    """
+
+    def __init__(self, sub_buckets=32):
+        self.sub_buckets = sub_buckets
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value <= 0:
+            return None  # Zero bucket, e.g. queries returning no rows
+        mantissa, exponent = math.frexp(value)
+        sub = int((mantissa - 0.5) * 2 * self.sub_buckets)
+        return exponent * self.sub_buckets + sub
+
+    def _midpoint(self, index):
+        if index is None:
+            return 0
+        exponent, sub = divmod(index, self.sub_buckets)
+        return math.ldexp(0.5 + (sub + 0.5) / (2 * self.sub_buckets), exponent)
+
+    def record(self, value):
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        if not self.count:
+            return None
+        target = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        # The zero bucket (None) sorts before every real bucket
+        for index in sorted(self.counts, key=lambda i: -math.inf if i is None else i):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(max(self._midpoint(index), self.min), self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.total / self.count if self.count else None,
+            "percentiles": {str(p): self.percentile(p) for p in PERCENTILES},
+        }
+
+
+class QueryMetrics:
+    """Collects one Histogram per (metric, query fingerprint)."""
+
+    def __init__(self, sub_buckets=32):
+        self.sub_buckets = sub_buckets
+        self._histograms = {}
+        self._lock = threading.Lock()  # Context managers may run in threads
+
+    def observe(self, metric, query, value):
+        key = (metric, fingerprint(query))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.sub_buckets)
+            histogram.record(value)
+
+    def record_query(self, query, connect=None, execute=None, fetch=None, rows=None):
+        for metric, value in zip(METRICS, (connect, execute, fetch, rows)):
+            if value is not None:
+                self.observe(metric, query, value)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def snapshot(self):
+        """Return {metric: {fingerprint: histogram summary}}."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            result = {}
+            for (metric, query), histogram in items:
+                result.setdefault(metric, {})[query] = histogram.snapshot()
+            return result
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def to_text(self):
+        lines = []
+        for metric, queries in self.snapshot().items():
+            lines.append(metric)
+            for query, stats in queries.items():
+                pcts = " ".join(f"p{p}={_format(v)}"
+                                for p, v in stats["percentiles"].items())
+                lines.append(f"  [{stats['count']}] {query or '(connect)'}")
+                lines.append(f"    min={_format(stats['min'])} "
+                             f"mean={_format(stats['mean'])} "
+                             f"max={_format(stats['max'])} {pcts}")
+        return "\n".join(lines) + "\n"
+
+    def to_prometheus(self, prefix="sqlite_query"):
+        """Render the histograms as Prometheus text-format summaries."""
+        lines = []
+        for metric, queries in self.snapshot().items():
+            name = f"{prefix}_{metric}"
+            lines.append(f"# TYPE {name} summary")
+            for query, stats in queries.items():
+                label = f'fingerprint="{_escape_label(query)}"'
+                for percent, value in stats["percentiles"].items():
+                    quantile = float(percent) / 100
+                    lines.append(f'{name}{{{label},quantile="{quantile:g}"}} {value!r}')
+                lines.append(f"{name}_sum{{{label}}} {stats['sum']!r}")
+                lines.append(f"{name}_count{{{label}}} {stats['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _format(value):
+    return "-" if value is None else f"{value:.6g}"
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def serve(metrics, port=9464, host="127.0.0.1"):
+    """
+    Expose `metrics` over HTTP from a background thread.
+
+    GET /metrics returns the Prometheus text format and /metrics.json the
+    JSON snapshot. Call shutdown() on the returned server to stop it.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = metrics.to_prometheus(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = metrics.to_json(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            payload = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass  # Keep scrapes out of stderr
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
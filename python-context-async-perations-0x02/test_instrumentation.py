@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Tests for instrumentation.py and the hooks in the database helpers"""
+import asyncio
+import json
+import math
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+import urllib.request
+from unittest.mock import patch
+
+import instrumentation
+from instrumentation import Histogram, QueryMetrics
+
+database_connection = __import__('0-databaseconnection')
+execute = __import__('1-execute')
+concurrent = __import__('3-concurrent')
+
+
+class HistogramTests(unittest.TestCase):
+
+    def test_percentiles_within_error_bound(self):
+        rng = random.Random(1)
+        for sub_buckets in (8, 32):
+            values = [rng.lognormvariate(-6, 3) for _ in range(5000)]
+            histogram = Histogram(sub_buckets)
+            for value in values:
+                histogram.record(value)
+            values.sort()
+            for percent in (1, 25, 50, 90, 99, 99.9):
+                exact = values[math.ceil(len(values) * percent / 100) - 1]
+                reported = histogram.percentile(percent)
+                self.assertLessEqual(abs(reported - exact) / exact,
+                                     1 / (2 * sub_buckets), (sub_buckets, percent))
+
+    def test_zero_and_extremes(self):
+        histogram = Histogram()
+        self.assertIsNone(histogram.percentile(50))
+        for value in (0, 0, 0, 3.0):
+            histogram.record(value)
+        self.assertEqual(histogram.percentile(50), 0)
+        # Never outside what was recorded
+        self.assertEqual(histogram.percentile(100), 3.0)
+        self.assertEqual(histogram.snapshot()["mean"], 0.75)
+
+
+class ExporterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = QueryMetrics()
+        for rows in (1, 2, 3, 4):
+            self.metrics.record_query("SELECT * FROM users WHERE id = 7",
+                                      execute=0.5, rows=rows)
+        self.metrics.observe("connect_seconds", None, 0.25)
+
+    def test_snapshot_and_json(self):
+        snapshot = json.loads(self.metrics.to_json())
+        self.assertEqual(sorted(snapshot), ["connect_seconds", "execute_seconds", "rows"])
+        rows = snapshot["rows"]["SELECT * FROM users WHERE id = ?"]
+        self.assertEqual((rows["count"], rows["sum"], rows["min"], rows["max"]), (4, 10, 1, 4))
+        self.assertEqual(snapshot["connect_seconds"][""]["percentiles"]["50"], 0.25)
+
+    def test_text(self):
+        text = self.metrics.to_text()
+        self.assertIn("connect_seconds\n  [1] (connect)\n", text)
+        self.assertIn("  [4] SELECT * FROM users WHERE id = ?\n"
+                      "    min=0.5 mean=0.5 max=0.5 p50=0.5", text)
+
+    def test_prometheus(self):
+        lines = self.metrics.to_prometheus().splitlines()
+        label = 'fingerprint="SELECT * FROM users WHERE id = ?"'
+        self.assertIn("# TYPE sqlite_query_execute_seconds summary", lines)
+        self.assertIn(f'sqlite_query_execute_seconds{{{label},quantile="0.5"}} 0.5', lines)
+        self.assertIn(f'sqlite_query_rows{{{label},quantile="0.999"}} 4', lines)
+        self.assertIn(f"sqlite_query_rows_sum{{{label}}} 10", lines)
+        self.assertIn(f"sqlite_query_rows_count{{{label}}} 4", lines)
+
+    def test_prometheus_escapes_labels(self):
+        metrics = QueryMetrics()
+        metrics.observe("rows", 'SELECT "a\\b"\nFROM t', 1)
+        self.assertIn('fingerprint="SELECT \\"a\\\\b\\" FROM t"', metrics.to_prometheus())
+
+    def test_serve(self):
+        server = instrumentation.serve(self.metrics, port=0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base = "http://127.0.0.1:{}".format(server.server_port)
+        with urllib.request.urlopen(base + "/metrics") as response:
+            self.assertEqual(response.read().decode(), self.metrics.to_prometheus())
+        with urllib.request.urlopen(base + "/metrics.json") as response:
+            self.assertEqual(json.load(response), self.metrics.snapshot())
+
+
+class HookTests(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.db_name = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.addCleanup(os.remove, self.db_name)
+        with sqlite3.connect(self.db_name) as db:
+            db.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, age INTEGER)")
+            db.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                           [(1, "Alice", 30), (2, "Bob", 45), (3, "Carol", 50)])
+        self.metrics = QueryMetrics()
+        instrumentation.set_hook(self.metrics)
+        self.addCleanup(instrumentation.set_hook, None)
+
+    def test_database_connection(self):
+        with database_connection.DatabaseConnection(self.db_name):
+            pass
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(list(snapshot), ["connect_seconds"])
+        self.assertEqual(snapshot["connect_seconds"][""]["count"], 1)
+
+    def test_execute_query(self):
+        query = "SELECT * FROM users WHERE age > ?"
+        with execute.ExecuteQuery(self.db_name, query, (40,)) as rows:
+            self.assertEqual(len(rows), 2)
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(sorted(snapshot), sorted(instrumentation.METRICS))
+        self.assertEqual(snapshot["rows"][query]["sum"], 2)
+
+    def test_async_fetch_rows(self):
+        with patch.object(concurrent, "DB_NAME", self.db_name):
+            rows = asyncio.run(concurrent.fetch_rows("SELECT * FROM users WHERE id = 1"))
+        self.assertEqual(rows, [(1, "Alice", 30)])
+        stats = self.metrics.snapshot()["execute_seconds"]["SELECT * FROM users WHERE id = ?"]
+        self.assertEqual(stats["count"], 1)
+
+    def test_nothing_recorded_without_a_hook(self):
+        instrumentation.set_hook(None)
+        with execute.ExecuteQuery(self.db_name, "SELECT 1"):
+            pass
+        self.assertEqual(self.metrics.snapshot(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Tests for 7-process_offload.py"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import aclosing
+
+offload = __import__('7-process_offload')
+
+
+# Transforms run in worker processes, so they live at module level
+def names(rows):
+    return [name for _, name in rows]
+
+
+def fail_on_third(rows):
+    if any(row_id == 3 for row_id, _ in rows):
+        raise ValueError("bad batch")
+    return names(rows)
+
+
+def connection_threads():
+    return [thread for thread in threading.enumerate()
+            if "_connection_worker_thread" in thread.name]
+
+
+class ProcessQueryTests(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        handle, self.db_name = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.addCleanup(os.remove, self.db_name)
+        with sqlite3.connect(self.db_name) as db:
+            db.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+            db.executemany("INSERT INTO users VALUES (?, ?)",
+                           [(n, f"user{n}") for n in range(1, 11)])
+
+    def process(self, transform, **kwargs):
+        return offload.process_query("SELECT id, name FROM users ORDER BY id",
+                                     transform, batch_size=2, max_workers=2,
+                                     db_name=self.db_name, **kwargs)
+
+    async def test_yields_every_batch_in_order(self):
+        batches = [batch async for batch in self.process(names)]
+        self.assertEqual(batches, [[f"user{n}", f"user{n + 1}"]
+                                   for n in range(1, 11, 2)])
+        self.assertEqual(connection_threads(), [])
+
+    async def test_early_exit_releases_connection(self):
+        async with aclosing(self.process(names)) as results:
+            async for batch in results:
+                self.assertEqual(batch, ["user1", "user2"])
+                break
+        # The connection's worker thread is joined when it closes
+        await asyncio.sleep(0)
+        self.assertEqual(connection_threads(), [])
+
+    async def test_transform_error_propagates(self):
+        seen = []
+        with self.assertRaises(ValueError):
+            async for batch in self.process(fail_on_third):
+                seen.append(batch)
+        self.assertEqual(seen, [["user1", "user2"]])
+        self.assertEqual(connection_threads(), [])
+
+    async def test_caller_executor_is_left_running(self):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            first = [b async for b in self.process(names, executor=executor)]
+            second = [b async for b in self.process(names, executor=executor)]
+        self.assertEqual(first, second)
+
+
+if __name__ == "__main__":
+    unittest.main()
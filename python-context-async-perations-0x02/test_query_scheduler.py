@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Tests for 4-query_scheduler.py"""
+import asyncio
+import unittest
+
+scheduler = __import__('4-query_scheduler')
+HIGH, NORMAL, LOW = scheduler.HIGH, scheduler.NORMAL, scheduler.LOW
+Query = scheduler.Query
+
+
+class FakeScheduler(scheduler.QueryScheduler):
+    """Runs queries without a database; "sleep:<s>[#tag]" takes s seconds."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.started = []
+        self.finished = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _execute(self, query):
+        self.started.append(query.sql)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if query.sql.startswith("sleep:"):
+                await asyncio.sleep(float(query.sql[6:].split("#")[0]))
+            else:
+                await asyncio.sleep(0)
+            self.finished.append(query.sql)
+            return [(query.sql,)]
+        finally:
+            self.in_flight -= 1
+
+
+class QuerySchedulerTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrency_limit(self):
+        runner = FakeScheduler(max_concurrency=3)
+        results = await runner.fetch_all([f"sleep:0.01#{n}" for n in range(10)])
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(runner.max_in_flight, 3)
+
+    async def test_priority_within_a_stream(self):
+        runner = FakeScheduler(max_concurrency=1)
+        queries = [Query("low", priority=LOW), Query("normal"),
+                   Query("high", priority=HIGH)]
+        await runner.fetch_all(queries)
+        self.assertEqual(runner.started, ["high", "normal", "low"])
+
+    async def test_priority_across_streams(self):
+        runner = FakeScheduler(max_concurrency=1)
+        background = [Query("sleep:0.01", priority=LOW)] + [
+            Query(f"low{n}", priority=LOW) for n in range(5)
+        ]
+        first = asyncio.create_task(runner.fetch_all(background))
+        await asyncio.sleep(0.005)  # The first LOW query holds the slot
+        second = await runner.fetch_all([Query("urgent", priority=HIGH)])
+        await first
+        self.assertTrue(second[0].ok)
+        self.assertEqual(runner.started[:2], ["sleep:0.01", "urgent"])
+
+    async def test_timeout(self):
+        runner = FakeScheduler(timeout=0.01)
+        results = await runner.fetch_all(
+            ["sleep:1", Query("sleep:0.02#own", timeout=0.5), "fast"]
+        )
+        errors = {r.query.sql: type(r.error) for r in results}
+        self.assertEqual(errors, {"sleep:1": asyncio.TimeoutError,
+                                  "sleep:0.02#own": type(None),
+                                  "fast": type(None)})
+
+    async def test_early_break_cleans_up(self):
+        runner = FakeScheduler(max_concurrency=2)
+        queries = ["quick"] + [f"sleep:1#{n}" for n in range(5)]
+        async for result in runner.stream(queries):
+            self.assertEqual(result.query.sql, "quick")
+            break
+        started = len(runner.started)
+        # The running queries were cancelled, the queued ones never start
+        # and every slot is free again
+        await asyncio.sleep(0.01)
+        self.assertIn(started, (2, 3))
+        self.assertEqual(len(runner.started), started)
+        self.assertEqual(runner.in_flight, 0)
+        self.assertEqual(runner._semaphore._value, 2)
+        after = await runner.fetch_all(["again"])
+        self.assertTrue(after[0].ok)
+
+    async def test_slot_freed_when_cancelled_before_starting(self):
+        runner = FakeScheduler(max_concurrency=2)
+        consumer = asyncio.create_task(runner.fetch_all(["sleep:1#a", "sleep:1#b"]))
+        dispatched = []
+        while not dispatched:
+            await asyncio.sleep(0)
+            dispatched = [task for task in asyncio.all_tasks()
+                          if task.get_coro().__qualname__.endswith("._run")]
+        self.assertEqual(runner.started, [])
+        for task in dispatched:
+            task.cancel()
+        await asyncio.gather(*dispatched, return_exceptions=True)
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+
+        self.assertEqual(runner.started, [])
+        self.assertEqual(runner._semaphore._value, 2)
+        after = await runner.fetch_all(["again"])
+        self.assertTrue(after[0].ok)
+
+
+if __name__ == "__main__":
+    unittest.main()
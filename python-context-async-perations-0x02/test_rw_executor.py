@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Tests for 5-rw_executor.py"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+rw_executor = __import__('5-rw_executor')
+ReadWriteExecutor = rw_executor.ReadWriteExecutor
+
+INSERT = "INSERT INTO users (id, name) VALUES (?, ?)"
+
+
+class HeldExecutor(ReadWriteExecutor):
+    """Holds the write lock with an uncommitted row until released."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.holding = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def _commit_batch(self, batch):
+        await self._writer_db.execute("BEGIN IMMEDIATE")
+        await self._writer_db.execute(INSERT, (999, "uncommitted"))
+        self.holding.set()
+        await self.release.wait()
+        await self._writer_db.execute("ROLLBACK")
+        await super()._commit_batch(batch)
+
+
+class ReadWriteExecutorTests(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_name = os.path.join(directory.name, "test.db")
+        with sqlite3.connect(self.db_name) as db:
+            db.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+
+    async def names(self, executor):
+        rows = await executor.read("SELECT name FROM users ORDER BY id")
+        return [name for name, in rows]
+
+    async def test_concurrent_writes_share_one_commit(self):
+        async with ReadWriteExecutor(self.db_name) as executor:
+            with patch.object(executor, "_commit_batch",
+                              wraps=executor._commit_batch) as commit:
+                counts = await asyncio.gather(*(
+                    executor.write(INSERT, (n, f"user{n}")) for n in range(20)
+                ))
+            self.assertEqual(counts, [1] * 20)
+            commit.assert_called_once()
+            self.assertEqual(len(commit.call_args.args[0]), 20)
+            self.assertEqual(len(await self.names(executor)), 20)
+
+    async def test_batch_size_caps_a_commit(self):
+        async with ReadWriteExecutor(self.db_name, batch_size=8) as executor:
+            with patch.object(executor, "_commit_batch",
+                              wraps=executor._commit_batch) as commit:
+                await asyncio.gather(*(
+                    executor.write(INSERT, (n, f"user{n}")) for n in range(20)
+                ))
+            self.assertEqual([len(call.args[0]) for call in commit.call_args_list],
+                             [8, 8, 4])
+
+    async def test_failed_write_rolls_back_alone(self):
+        async with ReadWriteExecutor(self.db_name) as executor:
+            results = await asyncio.gather(
+                executor.write(INSERT, (1, "first")),
+                executor.write(INSERT, (1, "duplicate")),
+                executor.write("UPDATE users SET name = 'renamed' WHERE id = 1"),
+                executor.write(INSERT, (2, "second")),
+                return_exceptions=True,
+            )
+            self.assertEqual(results[0], 1)
+            self.assertIsInstance(results[1], sqlite3.IntegrityError)
+            self.assertEqual(results[2:], [1, 1])
+            self.assertEqual(await self.names(executor), ["renamed", "second"])
+
+    async def test_reads_run_while_a_batch_is_pending(self):
+        async with HeldExecutor(self.db_name) as executor:
+            write = asyncio.create_task(executor.write(INSERT, (1, "first")))
+            try:
+                await asyncio.wait_for(executor.holding.wait(), 1)
+                # The writer holds the lock mid-transaction; reads neither
+                # wait for it nor see its uncommitted row
+                rows = await asyncio.wait_for(self.names(executor), 1)
+                self.assertEqual(rows, [])
+                self.assertFalse(write.done())
+            finally:
+                executor.release.set()
+            self.assertEqual(await write, 1)
+            self.assertEqual(await self.names(executor), ["first"])
+
+
+if __name__ == "__main__":
+    unittest.main()
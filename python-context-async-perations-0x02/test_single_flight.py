@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Tests for 6-single_flight.py"""
+import asyncio
+import unittest
+
+single_flight = __import__('6-single_flight')
+SingleFlight = single_flight.SingleFlight
+
+
+class Work:
+    """Counts calls; each call takes a loop turn, or raises if asked to."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, value, error=None):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if error is not None:
+            raise error
+        return value
+
+
+class SingleFlightTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrent_callers_share_one_execution(self):
+        flight, work = SingleFlight(), Work()
+        results = await asyncio.gather(*(
+            flight.do("key", work, 42) for _ in range(20)
+        ))
+        self.assertEqual(results, [42] * 20)
+        self.assertEqual(work.calls, 1)
+        # Without a ttl the next call runs again
+        await flight.do("key", work, 42)
+        self.assertEqual(work.calls, 2)
+
+    async def test_errors_reach_every_waiter_and_are_not_cached(self):
+        flight, work = SingleFlight(ttl=60), Work()
+        results = await asyncio.gather(
+            *(flight.do("key", work, 1, ValueError("boom")) for _ in range(5)),
+            return_exceptions=True,
+        )
+        self.assertEqual(work.calls, 1)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(await flight.do("key", work, 2), 2)
+
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        flight, work = SingleFlight(), Work()
+        first = asyncio.create_task(flight.do("key", work, 7))
+        second = asyncio.create_task(flight.do("key", work, 7))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, 7)
+        self.assertEqual(work.calls, 1)
+
+    async def test_ttl_expiry(self):
+        now = [100.0]
+        flight, work = SingleFlight(ttl=10, clock=lambda: now[0]), Work()
+        await flight.do("key", work, 1)
+        now[0] = 109.0
+        self.assertEqual(await flight.do("key", work, 2), 1)
+        now[0] = 110.0
+        self.assertEqual(await flight.do("key", work, 3), 3)
+        self.assertEqual(work.calls, 2)
+
+    async def test_cached_results_are_bounded(self):
+        flight, work = SingleFlight(ttl=60, max_results=3), Work()
+        for key in range(10):
+            await flight.do(key, work, key)
+        self.assertEqual(list(flight._results), [7, 8, 9])
+
+    async def test_expired_results_are_swept(self):
+        now = [100.0]
+        flight, work = SingleFlight(ttl=10, clock=lambda: now[0]), Work()
+        for key in range(5):
+            await flight.do(key, work, key)
+        now[0] = 111.0
+        await flight.do("fresh", work, 0)
+        self.assertEqual(list(flight._results), ["fresh"])
+
+
+if __name__ == "__main__":
+    unittest.main()